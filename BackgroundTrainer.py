@@ -0,0 +1,102 @@
+# Minibatch DQN training on a background thread
+# The rollouts keep feeding take_in_data while the thread runs
+# steps_per_env_step gradient steps for every transition received.
+
+import time
+import threading
+import torch
+from AI_Club_Tetris.SharedTransport import drain
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# Peak memory of this process (and of the GPU when training there)
+def get_peak_memory():
+    peak = {}
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux
+        peak["peak_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    if torch.cuda.is_available():
+        peak["peak_cuda_bytes"] = torch.cuda.max_memory_allocated()
+    return peak
+
+
+class BackgroundTrainer:
+    def __init__(self, agent, steps_per_env_step=0.25, min_samples=1_000):
+        self.agent = agent
+        self.steps_per_env_step = steps_per_env_step
+        self.min_samples = min_samples
+        # Guards the agent (memory and weights), hold it to read the weights
+        self.lock = threading.Lock()
+        self.has_work = threading.Event()
+        self.pending_steps = 0.0
+        # Stats
+        self.steps = 0
+        self.samples = 0
+        self.last_loss = None
+        self.train_time = 0.0
+        self.start_time = None
+
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.start_time = time.perf_counter()
+        self.thread = threading.Thread(target=self.loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.has_work.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def take_in_data(self, data):
+        with self.lock:
+            self.agent.take_in_data(data)
+            self.samples += len(data)
+            self.pending_steps += len(data) * self.steps_per_env_step
+        self.has_work.set()
+
+    # Same for the transitions published in the rollout rings (see SharedTransport.drain)
+    # >> Returns: transitions moved
+    def take_in_rings(self, rings):
+        with self.lock:
+            count = drain(rings, self.agent.memory)
+            self.samples += count
+            self.pending_steps += count * self.steps_per_env_step
+        if count:
+            self.has_work.set()
+        return count
+
+    def loop(self):
+        while self.running:
+            self.has_work.wait()
+            with self.lock:
+                if self.pending_steps < 1 or len(self.agent.memory) < self.min_samples:
+                    self.has_work.clear()
+                    continue
+                start = time.perf_counter()
+                self.last_loss = self.agent.train_steps(1)
+                self.train_time += time.perf_counter() - start
+                self.pending_steps -= 1
+                self.steps += 1
+            # Let the rollouts grab the lock
+            time.sleep(0)
+
+    def get_stats(self):
+        elapsed = time.perf_counter() - self.start_time if self.start_time else 0.0
+        stats = {
+            "steps": self.steps,
+            "samples": self.samples,
+            "pending_steps": int(self.pending_steps),
+            "loss": self.last_loss,
+            "steps_per_sec": self.steps / elapsed if elapsed else 0.0,
+            "busy_steps_per_sec": self.steps / self.train_time if self.train_time else 0.0,
+        }
+        stats.update(get_peak_memory())
+        return stats
@@ -0,0 +1,237 @@
+# Vectorized version of the TetrisGame.py logic
+# Steps N games at once, every game is a slot in the same NumPy arrays
+# Keep the coupling to a minimum
+
+import numpy as np
+from AI_Club_Tetris import TetrisFitness as TFit
+from AI_Club_Tetris.TetrisSettings import *
+
+
+###############
+# Tile Tables #
+###############
+# Indexed by [tile id, rotation count], tile id = index in TILES (board value - 1)
+def build_tile_tables():
+    cells_y = np.zeros((len(TILES), 4, 4), dtype=np.int64)
+    cells_x = np.zeros((len(TILES), 4, 4), dtype=np.int64)
+    widths = np.zeros((len(TILES), 4), dtype=np.int64)
+    heights = np.zeros((len(TILES), 4), dtype=np.int64)
+    for tile_id, name in enumerate(TILES):
+        shape = TILE_SHAPES[name]
+        for rotation in range(4):
+            cells = [(cy, cx) for cy, row in enumerate(shape) for cx, val in enumerate(row) if val != 0]
+            cells_y[tile_id, rotation] = [cy for cy, _ in cells]
+            cells_x[tile_id, rotation] = [cx for _, cx in cells]
+            widths[tile_id, rotation] = len(shape[0])
+            heights[tile_id, rotation] = len(shape)
+            # Same rotation as TetrisUtils.get_rotated_tile
+            shape = list(zip(*reversed(shape)))
+    return cells_y, cells_x, widths, heights
+
+
+CELLS_Y, CELLS_X, WIDTHS, HEIGHTS = build_tile_tables()
+SPAWN_X = (GRID_COL_COUNT / 2 - WIDTHS[:, 0] / 2).astype(np.int64)
+# TetrisGame.generate_tile_bank shuffles the TILE_SHAPES keys
+BANK_TILES = np.array([TILES.index(name) for name in TILE_SHAPES.keys()], dtype=np.int8)
+
+
+class BatchedTetrisEnv:
+    def __init__(self, count, seed=None):
+        self.count = count
+        self.obs_size = GRID_ROW_COUNT * GRID_COL_COUNT
+        self.rng = np.random.default_rng(seed)
+        self.all = np.arange(count)
+
+        # Boards hold the board values (0 = empty, tile id + 1 otherwise)
+        self.boards = np.zeros((count, GRID_ROW_COUNT, GRID_COL_COUNT), dtype=np.uint8)
+        # Tile bank is a stack, the next tile is at banks[n, bank_sizes[n] - 1]
+        self.banks = np.zeros((count, len(BANK_TILES)), dtype=np.int8)
+        self.bank_sizes = np.zeros(count, dtype=np.int64)
+        # Current tile
+        self.tiles = np.zeros(count, dtype=np.int64)
+        self.rotations = np.zeros(count, dtype=np.int64)
+        self.tile_x = np.zeros(count, dtype=np.int64)
+        self.tile_y = np.zeros(count, dtype=np.int64)
+        # Scores
+        self.active = np.ones(count, dtype=bool)
+        self.scores = np.zeros(count, dtype=np.float64)
+        self.lines = np.zeros(count, dtype=np.int64)
+        self.fitness = np.zeros(count, dtype=np.float64)
+        self.high_score = 0.0
+        self.high_score_lines = 0
+
+        self.reset()
+
+    # Reset the given games (all by default), returns the observations
+    def reset(self, idx=None):
+        idx = self.all if idx is None else np.asarray(idx, dtype=np.int64)
+        if len(idx):
+            self.high_score = max(self.high_score, float(self.scores[idx].max()))
+            self.high_score_lines = max(self.high_score_lines, int(self.lines[idx].max()))
+        self.boards[idx] = 0
+        self.bank_sizes[idx] = 0
+        self.active[idx] = True
+        self.scores[idx] = 0.0
+        self.lines[idx] = 0
+        self.fitness[idx] = 0.0
+        self.spawn_tiles(idx)
+        return self.get_observations()
+
+    # Action = index of { NOTHING, L, R, 2L, 2R, ROTATE, SWAP, FAST_FALL, INSTA_FALL }
+    # >> Returns: boards (N, 20, 10), score changes (N), is-game-over (N), next tile ids (N)
+    # Finished games are reset, their observation is the first one of the new game
+    def step(self, actions, use_fitness=False):
+        actions = np.asarray(actions)
+        previous_score = self.scores.copy()
+        previous_fitness = self.fitness.copy()
+        # Move action
+        for action, delta in ((1, -1), (2, 1), (3, -2), (4, 2)):
+            self.move_tiles(self.all[(actions == action) & self.active], delta)
+        # Rotate
+        self.rotate_tiles(self.all[(actions == 5) & self.active])
+        # Swap
+        self.swap_tiles(self.all[(actions == 6) & self.active])
+        # Fast fall / Insta-fall
+        self.drop(self.all[(actions == 7) & self.active])
+        self.drop(self.all[(actions == 8) & self.active], instant=True)
+        # Continue by 1 step
+        self.drop(self.all[self.active])
+
+        measurement = self.scores - previous_score
+        if use_fitness:
+            measurement = self.fitness - previous_fitness
+        dones = ~self.active
+        if dones.any():
+            self.reset(self.all[dones])
+        return self.get_observations(), measurement, dones, self.get_next_tiles()
+
+    #############
+    # Game Step #
+    #############
+    def check_collision(self, idx, tiles, rotations, offset_x, offset_y):
+        cy = CELLS_Y[tiles, rotations] + offset_y[:, None]
+        cx = CELLS_X[tiles, rotations] + offset_x[:, None]
+        outside = (cx < 0) | (cx >= GRID_COL_COUNT) | (cy < 0) | (cy >= GRID_ROW_COUNT)
+        cells = self.boards[idx[:, None], np.clip(cy, 0, GRID_ROW_COUNT - 1), np.clip(cx, 0, GRID_COL_COUNT - 1)]
+        return (outside | (cells != 0)).any(axis=1)
+
+    def get_effective_height(self, idx):
+        tiles, rotations, offset_x = self.tiles[idx], self.rotations[idx], self.tile_x[idx]
+        offset_y = self.tile_y[idx].copy()
+        falling = np.arange(len(idx))
+        while len(falling):
+            hit = self.check_collision(idx[falling], tiles[falling], rotations[falling], offset_x[falling],
+                                       offset_y[falling])
+            falling = falling[~hit]
+            offset_y[falling] += 1
+        return offset_y - 1
+
+    def move_tiles(self, idx, delta):
+        tiles, rotations = self.tiles[idx], self.rotations[idx]
+        # Clamping
+        new_x = np.clip(self.tile_x[idx] + delta, 0, GRID_COL_COUNT - WIDTHS[tiles, rotations])
+        # Cannot "override" blocks AKA cannot move when it is blocked
+        ok = ~self.check_collision(idx, tiles, rotations, new_x, self.tile_y[idx])
+        self.tile_x[idx[ok]] = new_x[ok]
+
+    def rotate_tiles(self, idx):
+        tiles = self.tiles[idx]
+        rotations = (self.rotations[idx] + 1) % 4
+        # Out of range detection
+        temp_x = np.minimum(self.tile_x[idx], GRID_COL_COUNT - WIDTHS[tiles, rotations])
+        # If collide, disallow rotation
+        ok = ~self.check_collision(idx, tiles, rotations, temp_x, self.tile_y[idx])
+        self.rotations[idx[ok]] = rotations[ok]
+        self.tile_x[idx[ok]] = temp_x[ok]
+
+    def swap_tiles(self, idx):
+        self.refill_banks(idx)
+        new_tiles = self.banks[idx, self.bank_sizes[idx] - 1].astype(np.int64)
+        tiles, rotations = self.tiles[idx], self.rotations[idx]
+        # Out of range detection (based on the current tile, like TetrisGame.swap_tile)
+        temp_x = np.minimum(self.tile_x[idx], GRID_COL_COUNT - WIDTHS[tiles, rotations])
+        temp_y = np.minimum(self.tile_y[idx], GRID_ROW_COUNT - HEIGHTS[tiles, rotations])
+        # If collide, disallow swapping
+        ok = ~self.check_collision(idx, new_tiles, np.zeros_like(new_tiles), temp_x, temp_y)
+        idx = idx[ok]
+        # Swap next tile with current tile
+        self.banks[idx, self.bank_sizes[idx] - 1] = self.tiles[idx]
+        self.tiles[idx] = new_tiles[ok]
+        self.rotations[idx] = 0
+        self.tile_x[idx] = temp_x[ok]
+        self.tile_y[idx] = temp_y[ok]
+
+    # Drop the current tiles by 1 grid
+    def drop(self, idx, instant=False):
+        if instant:
+            destination = self.get_effective_height(idx)
+            self.scores[idx] += PER_STEP_SCORE_GAIN * (destination - self.tile_y[idx])
+            self.tile_y[idx] = destination + 1
+            collided = idx
+        else:
+            self.tile_y[idx] += 1
+            self.scores[idx] += PER_STEP_SCORE_GAIN
+            collided = idx[self.check_collision(idx, self.tiles[idx], self.rotations[idx], self.tile_x[idx],
+                                                self.tile_y[idx])]
+        # Collided! Add tile to board, spawn new tile, and calculate scores
+        self.add_tiles_to_boards(collided)
+        self.calculate_scores(collided)
+        self.spawn_tiles(collided)
+
+    def add_tiles_to_boards(self, idx):
+        tiles, rotations = self.tiles[idx], self.rotations[idx]
+        cy = CELLS_Y[tiles, rotations] + self.tile_y[idx][:, None] - 1
+        cx = np.minimum(CELLS_X[tiles, rotations] + self.tile_x[idx][:, None], GRID_COL_COUNT - 1)
+        self.boards[idx[:, None], cy, cx] = (tiles + 1)[:, None]
+
+    # Calculate score (called after every collision)
+    def calculate_scores(self, idx):
+        full = (self.boards[idx] != 0).all(axis=2)
+        score_count = full.sum(axis=1)
+        cleared = score_count > 0
+        if cleared.any():
+            rows = idx[cleared]
+            # Move the "filled" rows to the top (keeping the order of the others) and empty them
+            order = np.argsort(~full[cleared], axis=1, kind="stable")
+            boards = np.take_along_axis(self.boards[rows], order[:, :, None], axis=1)
+            boards[np.arange(GRID_ROW_COUNT)[None, :] < score_count[cleared][:, None]] = 0
+            self.boards[rows] = boards
+            self.scores[rows] += MULTI_SCORE_ALGORITHM(score_count[cleared])
+            self.lines[rows] += score_count[cleared]
+        # Calculate fitness score
+        self.fitness[idx] = TFit.get_fitness_scores(self.boards[idx])
+
+    def spawn_tiles(self, idx):
+        self.refill_banks(idx)
+        self.bank_sizes[idx] -= 1
+        self.tiles[idx] = self.banks[idx, self.bank_sizes[idx]]
+        self.rotations[idx] = 0
+        self.tile_x[idx] = SPAWN_X[self.tiles[idx]]
+        self.tile_y[idx] = 0
+        collided = self.check_collision(idx, self.tiles[idx], self.rotations[idx], self.tile_x[idx], self.tile_y[idx])
+        self.active[idx[collided]] = False
+
+    ##############
+    # Tile Banks #
+    ##############
+    def refill_banks(self, idx):
+        empty = idx[self.bank_sizes[idx] == 0]
+        if not len(empty):
+            return
+        self.banks[empty] = self.rng.permuted(np.tile(BANK_TILES, (len(empty), 1)), axis=1)
+        self.bank_sizes[empty] = len(BANK_TILES)
+
+    def get_next_tiles(self):
+        self.refill_banks(self.all)
+        return self.banks[self.all, self.bank_sizes - 1].astype(np.int64)
+
+    ################
+    # Observations #
+    ################
+    # Flattened boards with the current tiles, same values as TetrisGame.step
+    def get_observations(self):
+        obs = (self.boards != 0).astype(np.uint8)
+        cy = CELLS_Y[self.tiles, self.rotations] + self.tile_y[:, None]
+        cx = CELLS_X[self.tiles, self.rotations] + self.tile_x[:, None]
+        obs[self.all[:, None], np.clip(cy, 0, GRID_ROW_COUNT - 1), cx] = (self.tiles + 1)[:, None]
+        return obs
@@ -0,0 +1,236 @@
+# Benchmarks for the engine, the heuristics and the agent inference
+# Every workload is seeded, so the numbers are comparable across commits
+# (on the same machine).
+#
+# python Benchmark.py                             print the results as JSON
+# python Benchmark.py -o baseline.json            save them
+# python Benchmark.py -b baseline.json [-t 0.1]   compare, exit code 1 on a regression
+
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import contextlib
+import numpy as np
+import TetrisGame, TetrisUtils, TetrisBitboard, TetrisFitness
+from TetrisSettings import *
+
+MIN_TIME = 0.5
+REPEATS = 3
+SEED = 0
+
+
+# Best rate of REPEATS runs, each run calls fn (returns its operation count) for MIN_TIME
+def measure(fn, min_time=MIN_TIME, repeats=REPEATS):
+    best = 0.0
+    for _ in range(repeats):
+        count = 0
+        start = time.perf_counter()
+        while True:
+            count += fn()
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        best = max(best, count / elapsed)
+    return best
+
+
+def get_result(value, unit, higher_is_better=True):
+    return {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+
+
+#############
+# Workloads #
+#############
+# Game positions (board, tile shape, next tile shape, offsets) from seeded random games
+def get_positions(count, seed=SEED):
+    rng = random.Random(seed)
+    game = TetrisGame.TetrisGame(headless=True, seed=seed)
+    positions = []
+    while len(positions) < count:
+        game.step(rng.randint(0, 8))
+        if not game.active:
+            game.reset()
+        positions.append(([row[:] for row in game.board], game.tile_shape, TILE_SHAPES[game.get_next_tile()],
+                          (game.tile_x, game.tile_y)))
+    return positions
+
+
+def get_actions(count, seed=SEED):
+    rng = random.Random(seed)
+    return [rng.randint(0, 8) for _ in range(count)]
+
+
+##############
+# Benchmarks #
+##############
+def bench_game_step(bitboard):
+    game = TetrisGame.TetrisGame(headless=True, bitboard=bitboard, seed=SEED)
+    actions = get_actions(1000)
+
+    def run():
+        for action in actions:
+            if game.step(action)[2]:
+                game.reset()
+        return len(actions)
+    return get_result(measure(run), "steps/sec")
+
+
+def bench_check_collision():
+    positions = get_positions(1000)
+
+    def run():
+        for board, tile_shape, _, offsets in positions:
+            TetrisUtils.check_collision(board, tile_shape, (offsets[0], offsets[1] + 1))
+        return len(positions)
+    return get_result(measure(run), "calls/sec")
+
+
+def bench_check_collision_bitboard():
+    # The game and the placement search keep the masks of their tiles around
+    positions = [(TetrisBitboard.from_board(board), TetrisBitboard.get_tile_masks(tile_shape), offsets)
+                 for board, tile_shape, _, offsets in get_positions(1000)]
+
+    def run():
+        for rows, masks, offsets in positions:
+            TetrisBitboard.check_collision_masks(rows, masks, (offsets[0], offsets[1] + 1))
+        return len(positions)
+    return get_result(measure(run), "calls/sec")
+
+
+def bench_fitness_score():
+    # Game boards never hold full rows, get_fitness_score leaves them untouched
+    boards = [board for board, _, _, _ in get_positions(1000)]
+
+    def run():
+        for board in boards:
+            TetrisUtils.get_fitness_score(board)
+        return len(boards)
+    return get_result(measure(run), "calls/sec")
+
+
+def bench_fitness_scores_batched():
+    boards = np.array([board for board, _, _, _ in get_positions(1000)])
+
+    def run():
+        TetrisFitness.get_fitness_scores(boards)
+        return len(boards)
+    return get_result(measure(run), "boards/sec")
+
+
+def bench_best_actions():
+    positions = get_positions(100)
+
+    def run():
+        for board, tile_shape, next_shape, offsets in positions:
+            TetrisUtils.get_best_actions(board, tile_shape, next_shape, offsets)
+        return len(positions)
+    return get_result(measure(run), "decisions/sec")
+
+
+def bench_random_episodes():
+    game = TetrisGame.TetrisGame(headless=True, seed=SEED)
+    rng = random.Random(SEED)
+
+    def run():
+        game.reset()
+        while not game.step(rng.randint(0, 8))[2]:
+            pass
+        return 1
+    return get_result(measure(run), "episodes/sec")
+
+
+# DQN_Model.forward latency on the CPU
+def bench_model_forward(batch_size):
+    import torch
+    from Pytorch_Agent import DQN_Model
+    torch.manual_seed(SEED)
+    model = DQN_Model(GRID_ROW_COUNT * GRID_COL_COUNT)
+    obs = torch.from_numpy(np.random.default_rng(SEED).integers(0, 2, (batch_size, GRID_ROW_COUNT * GRID_COL_COUNT))
+                           .astype(np.float32))
+
+    def run():
+        with torch.no_grad():
+            model.forward(obs)
+        return 1
+    return get_result(1000 / measure(run), "ms", higher_is_better=False)
+
+
+BENCHMARKS = {
+    "game_step": lambda: bench_game_step(False),
+    "game_step_bitboard": lambda: bench_game_step(True),
+    "check_collision": bench_check_collision,
+    "check_collision_bitboard": bench_check_collision_bitboard,
+    "get_fitness_score": bench_fitness_score,
+    "get_fitness_scores_batched": bench_fitness_scores_batched,
+    "get_best_actions": bench_best_actions,
+    "random_episodes": bench_random_episodes,
+    "model_forward_batch_1": lambda: bench_model_forward(1),
+    "model_forward_batch_32": lambda: bench_model_forward(32),
+    "model_forward_batch_256": lambda: bench_model_forward(256),
+}
+
+
+def run_benchmarks(names=None):
+    results = {}
+    for name, bench in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        try:
+            results[name] = bench()
+        except ImportError as e:
+            # torch is optional
+            print(f"Skipping {name}: {e}", file=sys.stderr)
+            continue
+        print(f"{name}: {results[name]['value']:.4g} {results[name]['unit']}", file=sys.stderr)
+    return {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+        },
+        "results": results,
+    }
+
+
+# >> Returns: [(name, baseline value, value, relative change), ...] worse than threshold
+def compare(report, baseline, threshold=0.1):
+    regressions = []
+    for name, result in report["results"].items():
+        if name not in baseline["results"]:
+            continue
+        old = baseline["results"][name]["value"]
+        change = (result["value"] - old) / old
+        if not result["higher_is_better"]:
+            change = -change
+        if change < -threshold:
+            regressions.append((name, old, result["value"], change))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default: all)")
+    parser.add_argument("-o", "--output", help="save the results to this file")
+    parser.add_argument("-b", "--baseline", help="compare against these saved results")
+    parser.add_argument("-t", "--threshold", type=float, default=0.1, help="allowed slowdown (0.1 = 10%%)")
+    args = parser.parse_args()
+
+    # Keep stdout for the JSON (the agents print on import)
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run_benchmarks(args.names)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for name, old, new, change in regressions:
+            print(f"REGRESSION {name}: {old:.4g} -> {new:.4g} ({change:+.1%})", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
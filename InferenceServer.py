@@ -0,0 +1,200 @@
+# Batched DQN inference shared by many environments
+# Environments (threads of this process, or worker processes through get_client)
+# submit single observations, a server thread gathers them into one batch
+# (up to max_batch_size, or until the oldest request waited max_latency seconds),
+# runs a single forward pass and answers every request with an epsilon-greedy action.
+#
+#   server = InferenceServer(agent)
+#   server.start()
+#   action = server.predict(obs)         # from any thread
+#   client = server.get_client()         # picklable, for worker processes
+#   action = client.predict(obs)
+#   print(server.summary())              # batch sizes and queue latency
+#   server.stop()
+
+import time
+import queue
+import threading
+import numpy as np
+import torch
+import multiprocessing as mp
+from AI_Club_Tetris.Profiler import PhaseStats
+from AI_Club_Tetris.TetrisSettings import *
+
+
+class InferenceRequest:
+    def __init__(self, obs, reply=None):
+        self.obs = obs
+        self.time = time.perf_counter()
+        # reply(action) answers process clients, thread clients wait on the event
+        self.reply = reply
+        self.event = None if reply is not None else threading.Event()
+        self.action = None
+
+    def answer(self, action):
+        if self.reply is not None:
+            self.reply(action)
+        else:
+            self.action = action
+            self.event.set()
+
+
+# Handle on the server for another process (get it from InferenceServer.get_client)
+class InferenceClient:
+    def __init__(self, client_id, requests, replies):
+        self.client_id = client_id
+        self.requests = requests
+        self.replies = replies
+
+    def predict(self, obs):
+        self.requests.put((self.client_id, np.asarray(obs, dtype=np.uint8).ravel()))
+        return self.replies.recv()
+
+
+class InferenceServer:
+    # lock: held around the forward passes (e.g. BackgroundTrainer.lock when training concurrently)
+    # seed: seed of the exploration
+    def __init__(self, agent, max_batch_size=INFERENCE_MAX_BATCH_SIZE, max_latency=INFERENCE_MAX_LATENCY,
+                 lock=None, seed=None):
+        self.agent = agent
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.lock = lock if lock is not None else threading.Lock()
+        self.np_random = np.random.default_rng(seed)
+        self.input_size = agent.model.dense1.in_features
+        self.obs = torch.zeros((max_batch_size, self.input_size))
+        self.requests = queue.Queue()
+        # Process clients
+        self.context = mp.get_context("spawn")
+        self.process_requests = None
+        self.replies = []
+        # Stats
+        self.batch_sizes = [0] * (max_batch_size + 1)
+        self.queue_latency = PhaseStats()
+        self.forward_time = PhaseStats()
+
+        self.running = False
+        self.threads = []
+
+    def start(self):
+        self.running = True
+        self.threads = [threading.Thread(target=self.loop, daemon=True)]
+        if self.process_requests is not None:
+            self.threads.append(threading.Thread(target=self.forward_process_requests, daemon=True))
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.running = False
+        self.requests.put(None)
+        if self.process_requests is not None:
+            self.process_requests.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    ###########
+    # Clients #
+    ###########
+    def predict(self, obs):
+        request = InferenceRequest(obs)
+        self.requests.put(request)
+        request.event.wait()
+        return request.action
+
+    # Call before start, one client per process
+    def get_client(self):
+        if self.process_requests is None:
+            self.process_requests = self.context.Queue()
+        receiver, sender = self.context.Pipe(duplex=False)
+        self.replies.append(sender)
+        return InferenceClient(len(self.replies) - 1, self.process_requests, receiver)
+
+    def forward_process_requests(self):
+        while True:
+            item = self.process_requests.get()
+            if item is None:
+                break
+            client_id, obs = item
+            self.requests.put(InferenceRequest(obs, self.replies[client_id].send))
+
+    ##########
+    # Server #
+    ##########
+    # Blocks for the first request, then gathers more until the batch is full or its deadline
+    # >> Returns: the requests, None once stopped
+    def get_batch(self):
+        request = self.requests.get()
+        if request is None:
+            return None
+        batch = [request]
+        deadline = request.time + self.max_latency
+        while len(batch) < self.max_batch_size:
+            try:
+                request = self.requests.get(timeout=max(0.0, deadline - time.perf_counter()))
+            except queue.Empty:
+                break
+            if request is None:
+                # Answer what was gathered, then stop
+                self.requests.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def loop(self):
+        while self.running:
+            batch = self.get_batch()
+            if batch is None:
+                break
+            self.run_batch(batch)
+
+    def run_batch(self, batch):
+        count = len(batch)
+        start = time.perf_counter()
+        obs = self.obs[:count]
+        for i, request in enumerate(batch):
+            obs[i] = torch.as_tensor(np.asarray(request.obs, dtype=np.float32).ravel())
+            self.queue_latency.add(start - request.time)
+        with self.lock, torch.no_grad():
+            # Wherever the model lives right now (DQN_Agent.train moves it to the GPU while it trains)
+            model_device = next(self.agent.model.parameters()).device
+            answer = self.agent.model.forward(obs.to(model_device))
+        actions = answer.argmax(1).cpu().numpy()
+        # Epsilon-greedy per request
+        explore = self.np_random.random(count) < self.agent.prob_random
+        actions[explore] = self.np_random.integers(0, self.agent.random_actions, explore.sum())
+        self.forward_time.add(time.perf_counter() - start)
+        self.batch_sizes[count] += 1
+        for request, action in zip(batch, actions.tolist()):
+            request.answer(action)
+
+    #########
+    # Stats #
+    #########
+    def get_stats(self):
+        batches = sum(self.batch_sizes)
+        requests = sum(size * count for size, count in enumerate(self.batch_sizes))
+        return {
+            "batches": batches,
+            "requests": requests,
+            "mean_batch_size": requests / batches if batches else 0.0,
+            "batch_sizes": {size: count for size, count in enumerate(self.batch_sizes) if count},
+            "queue_latency": self.queue_latency.to_dict(),
+            "forward_time": self.forward_time.to_dict(),
+        }
+
+    def summary(self):
+        stats = self.get_stats()
+        lines = [f"{stats['requests']} requests in {stats['batches']} batches "
+                 f"(mean batch size {stats['mean_batch_size']:.1f})"]
+        for name, phase in (("queue latency", self.queue_latency), ("forward", self.forward_time)):
+            if phase.count:
+                lines.append(f"{name:<14} mean {1e6 * phase.total / phase.count:.0f}us "
+                             f"p50 {1e6 * phase.get_quantile(0.5):.0f}us p99 {1e6 * phase.get_quantile(0.99):.0f}us "
+                             f"max {1e6 * phase.max:.0f}us")
+        return "\n".join(lines)
+
+    def reset_stats(self):
+        self.batch_sizes = [0] * (self.max_batch_size + 1)
+        self.queue_latency = PhaseStats()
+        self.forward_time = PhaseStats()
@@ -0,0 +1,180 @@
+# Opt-in per-phase timing for the runners
+# Phases: env_step, observation, inference, replay_insert, train, render
+#
+# Nothing is instrumented unless the profiler is enabled: instrument_game /
+# instrument_agent / instrument_model wrap the methods of the given objects
+# (not their classes), so a disabled profiler costs nothing on the hot paths.
+# Phase times are inclusive (env_step includes the observation it builds).
+#
+#   profiler = Profiler(PROFILE_ENABLED)
+#   profiler.instrument_game(game)
+#   profiler.instrument_agent(agent)
+#   ...
+#   profiler.maybe_report()  # in the training loop, prints every report_interval seconds
+
+import sys
+import json
+import time
+import threading
+from functools import wraps
+
+# Bucket i of a histogram counts the calls that took [2^(i-1), 2^i) microseconds
+HISTOGRAM_SIZE = 32
+
+GAME_PHASES = {"step": "env_step", "get_observation": "observation", "write_observation": "observation",
+               "draw": "render"}
+AGENT_PHASES = {"predict": "inference", "predict_batch": "inference", "take_in_data": "replay_insert",
+                "train": "train", "train_batch": "train"}
+
+
+class PhaseStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = [0] * HISTOGRAM_SIZE
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.histogram[min(int(seconds * 1e6).bit_length(), HISTOGRAM_SIZE - 1)] += 1
+
+    # Upper bound of the bucket holding the q quantile (at most the max), in seconds
+    def get_quantile(self, q):
+        target = q * self.count
+        seen = 0
+        for i, count in enumerate(self.histogram):
+            seen += count
+            if count and seen >= target:
+                return min((1 << i) / 1e6, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {"count": self.count, "total": self.total, "max": self.max, "histogram": self.histogram}
+
+    def merge(self, stats):
+        self.count += stats["count"]
+        self.total += stats["total"]
+        self.max = max(self.max, stats["max"])
+        self.histogram = [a + b for a, b in zip(self.histogram, stats["histogram"])]
+
+
+class Phase:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *args):
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+
+
+class NoPhase:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *args):
+        pass
+
+
+NO_PHASE = NoPhase()
+
+
+class Profiler:
+    # report_interval: seconds between two maybe_report prints
+    # dump_path: also write the stats there as JSON on every report
+    def __init__(self, enabled=False, report_interval=30.0, dump_path=None):
+        self.enabled = enabled
+        self.report_interval = report_interval
+        self.dump_path = dump_path
+        self.phases = {}
+        # The background trainer records from its own thread
+        self.lock = threading.Lock()
+        self.start_time = time.perf_counter()
+        self.last_report = self.start_time
+
+    def record(self, name, seconds):
+        with self.lock:
+            stats = self.phases.get(name)
+            if stats is None:
+                stats = self.phases[name] = PhaseStats()
+            stats.add(seconds)
+
+    # with profiler.phase("name"): ... (for code that is not a method)
+    def phase(self, name):
+        return Phase(self, name) if self.enabled else NO_PHASE
+
+    # Wraps obj.method_name (on the instance) so that every call is recorded as phase
+    def instrument(self, obj, method_name, phase):
+        if not self.enabled or not hasattr(obj, method_name):
+            return
+        method = getattr(obj, method_name)
+        record = self.record
+
+        @wraps(method)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                record(phase, time.perf_counter() - start)
+        setattr(obj, method_name, timed)
+
+    def instrument_game(self, game):
+        for method_name, phase in GAME_PHASES.items():
+            self.instrument(game, method_name, phase)
+
+    def instrument_agent(self, agent):
+        for method_name, phase in AGENT_PHASES.items():
+            self.instrument(agent, method_name, phase)
+
+    # For a bare model (the rollout workers call forward directly)
+    def instrument_model(self, model):
+        self.instrument(model, "forward", "inference")
+
+    ###########
+    # Reports #
+    ###########
+    def to_dict(self):
+        with self.lock:
+            return {name: stats.to_dict() for name, stats in self.phases.items()}
+
+    # Adds the stats of another profiler (e.g. sent back by a rollout worker)
+    def merge(self, phases):
+        with self.lock:
+            for name, stats in phases.items():
+                self.phases.setdefault(name, PhaseStats()).merge(stats)
+
+    def reset(self):
+        with self.lock:
+            self.phases = {}
+        self.start_time = time.perf_counter()
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.start_time
+        lines = [f"Profile over {elapsed:.1f}s",
+                 f"{'phase':<16}{'calls':>10}{'total s':>10}{'% wall':>8}{'mean us':>10}{'p50 us':>10}"
+                 f"{'p99 us':>10}{'max us':>10}"]
+        with self.lock:
+            phases = sorted(self.phases.items(), key=lambda item: item[1].total, reverse=True)
+            for name, stats in phases:
+                lines.append(f"{name:<16}{stats.count:>10}{stats.total:>10.2f}{100 * stats.total / elapsed:>8.1f}"
+                             f"{1e6 * stats.total / stats.count:>10.1f}{1e6 * stats.get_quantile(0.5):>10.0f}"
+                             f"{1e6 * stats.get_quantile(0.99):>10.0f}{1e6 * stats.max:>10.0f}")
+        return "\n".join(lines)
+
+    def report(self):
+        print(self.summary(), file=sys.stderr)
+        if self.dump_path is not None:
+            with open(self.dump_path, "w") as f:
+                json.dump({"elapsed": time.perf_counter() - self.start_time, "phases": self.to_dict()}, f)
+        self.last_report = time.perf_counter()
+
+    # Call it as often as you like, reports every report_interval seconds
+    def maybe_report(self):
+        if self.enabled and time.perf_counter() - self.last_report >= self.report_interval:
+            self.report()
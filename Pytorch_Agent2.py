@@ -8,6 +8,7 @@ import time
 
 import numpy as np
 import random
+from ReplayMemory import ReplayMemory
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 print(device)
@@ -43,37 +44,39 @@ class DQN_Model(nn.Module):
 # maybe add the shoot down option
 class DQN_Agent():
 
-    def __init__(self, input_size):
+    # seed: seed of the exploration (its own random stream)
+    def __init__(self, input_size, seed=None):
         # gamma is the decay rate
         # or the amount that we don't want reward to propigate
         self.gamma = .9
         self.prob_random = .1
+        # random actions are drawn from the first random_actions actions
+        self.random_actions = 4
+        self.random = random.Random(seed)
+        self.np_random = np.random.default_rng(seed)
         self.epochs = 25
+        # minibatch training (train_batch / train_steps)
+        self.batch_size = 256
         # define the layers
         # will come in as flattend rep of the board game
         self.model = DQN_Model(input_size)
 
         self.optimizer = optim.Adam(self.model.parameters(), lr=1e-3)
 
-        self.data = []
-
         self.data_max = 50_000
 
+        # oldest transitions get overwritten once data_max is reached
+        self.memory = ReplayMemory(self.data_max, input_size, seed)
+
     def take_in_data(self, data):
         # take in the data
         # flatten the observations
         # put everything into numpy arrays
         obs, action, new_obs, reward, done = zip(*data)
-        # obs = torch.tensor(obs).flatten(1)
-        # new_obs = torch.tensor(new_obs).flatten(1)
-        # reward = torch.tensor(reward)
-        # done = torch.tensor(done)
-        self.data.extend(zip(obs, action, new_obs, reward, done))
-        if len(self.data) > self.data_max:
-            del self.data[0:len(self.data) - self.data_max]
+        self.memory.add_batch(obs, action, new_obs, reward, done)
 
     def train(self):
-        print("Training on this many samples", len(self.data))
+        print("Training on this many samples", len(self.memory))
         # this should be fun
         # we want our network to predict the rewards given that input
 
@@ -90,13 +93,12 @@ class DQN_Agent():
 
         # how do we formulate that as a deep learning question
         # we want 
-        obs, actions, next_obs, rewards, dones = zip(*self.data)
-        # TODO Figure out why this can't be done in the take in data step
-        obs = torch.tensor(obs).flatten(1).float().to(device)
-        next_obs = torch.tensor(next_obs).flatten(1).float().to(device)
-        rewards = torch.tensor(rewards).unsqueeze(1).float().to(device)
-        running = torch.tensor([not x for x in dones]).unsqueeze(1).float().to(device)
-        actions = torch.tensor(actions).unsqueeze(1).to(device)
+        obs, actions, next_obs, rewards, dones = self.memory.get_all()
+        obs = torch.from_numpy(obs).float().to(device)
+        next_obs = torch.from_numpy(next_obs).float().to(device)
+        rewards = torch.from_numpy(rewards).unsqueeze(1).to(device)
+        running = torch.from_numpy(~dones).unsqueeze(1).float().to(device)
+        actions = torch.from_numpy(actions).long().unsqueeze(1).to(device)
 
         # all of these are numpy arrays
         # if something looks weird it could be because
@@ -122,10 +124,50 @@ class DQN_Agent():
         self.model.to('cpu')
         torch.save(self.model.state_dict(), f"models/neo/agent_{int(round(time.time() * 1000))}.torch")
 
+    # One gradient step on a minibatch (e.g. from self.memory.sample)
+    # runs wherever the model currently lives so predict can keep using it
+    def train_batch(self, obs, actions, next_obs, rewards, dones):
+        model_device = next(self.model.parameters()).device
+        obs = torch.from_numpy(obs).float().to(model_device)
+        next_obs = torch.from_numpy(next_obs).float().to(model_device)
+        rewards = torch.from_numpy(rewards).unsqueeze(1).to(model_device)
+        running = torch.from_numpy(~dones).unsqueeze(1).float().to(model_device)
+        actions = torch.from_numpy(actions).long().unsqueeze(1).to(model_device)
+
+        model_value_of_next_state = self.model.forward(next_obs).detach().max(1)[0].unsqueeze(1)
+
+        target_for_this_state = rewards + (self.gamma * model_value_of_next_state * running)
+
+        model_current_estimate = self.model.forward(obs).gather(1, actions)
+
+        loss = F.mse_loss(model_current_estimate, target_for_this_state)
+
+        self.optimizer.zero_grad()
+        loss.backward()
+        self.optimizer.step()
+        return loss.item()
+
+    def train_steps(self, steps):
+        loss = None
+        for i in range(steps):
+            loss = self.train_batch(*self.memory.sample(self.batch_size))
+        return loss
+
     def predict(self, obs):
-        if random.random() < self.prob_random:
-            return random.randint(0, 3)
+        if self.random.random() < self.prob_random:
+            return self.random.randint(0, self.random_actions - 1)
 
         obs = torch.tensor(obs).flatten().float()
         answer = self.model.forward(obs).detach()
         return np.argmax(answer)
+
+
+    # Batched version of predict, obs is a (N, 20, 10) array (e.g. from BatchedTetrisEnv)
+    def predict_batch(self, obs):
+        obs = torch.as_tensor(obs).flatten(1).float()
+        with torch.no_grad():
+            answer = self.model.forward(obs)
+        actions = answer.argmax(1).numpy()
+        explore = self.np_random.random(len(actions)) < self.prob_random
+        actions[explore] = self.np_random.integers(0, self.random_actions, explore.sum())
+        return actions
@@ -0,0 +1,73 @@
+# Replay memory for the DQN agents
+# Fixed-size preallocated arrays used as a ring buffer, the oldest
+# transitions are overwritten once the memory is full.
+
+import numpy as np
+
+
+class ReplayMemory:
+    def __init__(self, capacity, obs_size, seed=None):
+        self.capacity = capacity
+        self.obs_size = obs_size
+        # Observations are board values (0-7), they fit in a byte
+        self.obs = np.zeros((capacity, obs_size), dtype=np.uint8)
+        self.actions = np.zeros(capacity, dtype=np.int8)
+        self.next_obs = np.zeros((capacity, obs_size), dtype=np.uint8)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=np.bool_)
+        # Next slot to write and number of valid entries
+        self.position = 0
+        self.size = 0
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return self.size
+
+    # Memory footprint of the buffers
+    @property
+    def nbytes(self):
+        return self.obs.nbytes + self.actions.nbytes + self.next_obs.nbytes + self.rewards.nbytes + self.dones.nbytes
+
+    def add(self, obs, action, next_obs, reward, done):
+        i = self.position
+        self.obs[i] = np.ravel(obs)
+        self.actions[i] = action
+        self.next_obs[i] = np.ravel(next_obs)
+        self.rewards[i] = reward
+        self.dones[i] = done
+        self.position = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    # Observations can be nested lists (TetrisGame.step) or arrays
+    def add_batch(self, obs, actions, next_obs, rewards, dones):
+        obs = np.asarray(obs, dtype=np.uint8).reshape(-1, self.obs_size)
+        next_obs = np.asarray(next_obs, dtype=np.uint8).reshape(-1, self.obs_size)
+        actions = np.asarray(actions, dtype=np.int8)
+        rewards = np.asarray(rewards, dtype=np.float32)
+        dones = np.asarray(dones, dtype=np.bool_)
+        count = len(obs)
+        # Only the newest entries would survive anyway
+        if count > self.capacity:
+            obs, actions, next_obs, rewards, dones = (arr[-self.capacity:] for arr in (obs, actions, next_obs, rewards, dones))
+            count = self.capacity
+        idx = (self.position + np.arange(count)) % self.capacity
+        self.obs[idx] = obs
+        self.actions[idx] = actions
+        self.next_obs[idx] = next_obs
+        self.rewards[idx] = rewards
+        self.dones[idx] = dones
+        self.position = (self.position + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+
+    # >> Returns: (obs, actions, next_obs, rewards, dones) copies for the given indices
+    def get(self, idx):
+        return self.obs[idx], self.actions[idx], self.next_obs[idx], self.rewards[idx], self.dones[idx]
+
+    # Uniform sampling (with replacement)
+    def sample(self, batch_size):
+        return self.get(self.rng.integers(0, self.size, batch_size))
+
+    # Views of every valid entry (not in insertion order once the memory wrapped)
+    def get_all(self):
+        return (self.obs[:self.size], self.actions[:self.size], self.next_obs[:self.size],
+                self.rewards[:self.size], self.dones[:self.size])
@@ -0,0 +1,165 @@
+# Multiprocess experience collection for the DQN runners
+# Every worker owns a headless TetrisGame and a CPU copy of the DQN_Model,
+# transitions are written in place into a SharedRing per worker (see
+# SharedTransport) while the learner drains them into its replay memory:
+#
+#   workers.start(25)
+#   while workers.collecting():
+#       drain(workers.rings, agent.memory)
+#   drain(workers.rings, agent.memory)
+
+import os
+import queue
+import random
+import numpy as np
+import torch
+import multiprocessing as mp
+from AI_Club_Tetris import TetrisGame as TGame
+from AI_Club_Tetris.Profiler import Profiler
+from AI_Club_Tetris.SharedTransport import OBS_SIZE, SharedRing
+from AI_Club_Tetris.TetrisSettings import *
+
+# Transitions a worker writes before publishing them (and at the end of every episode)
+PUBLISH_SIZE = 256
+
+
+##########
+# Worker #
+##########
+# rng: the exploration stream of the worker
+def run_episodes(game, model, episodes, ring, prob_random, random_actions, use_fitness, rng):
+    count = 0
+    views = ring.views
+    obs = np.zeros(OBS_SIZE, dtype=np.uint8)
+    for _ in range(episodes):
+        game.reset()
+        game.write_observation(obs)
+        done = False
+        while not done:
+            if rng.random() < prob_random:
+                action = rng.randint(0, random_actions - 1)
+            else:
+                with torch.no_grad():
+                    action = int(model.forward(torch.from_numpy(obs).float()).argmax())
+            # Waits while the learner is a whole ring behind
+            i = ring.next_slot()
+            views["obs"][i] = obs
+            # The game writes the next observation straight into shared memory
+            next_obs = views["next_obs"][i]
+            game.set_observation_buffer(next_obs)
+            _, reward, done, _ = game.step(action, use_fitness)
+            views["actions"][i] = action
+            views["rewards"][i] = reward
+            views["dones"][i] = done
+            ring.commit()
+            obs[:] = next_obs
+            count += 1
+            if ring.pending >= PUBLISH_SIZE:
+                ring.publish()
+        ring.publish()
+    return count
+
+
+# seed: seed of the worker (its tiles and its exploration), None for an unseeded worker
+def rollout_worker(worker_id, model_class, input_size, prob_random, random_actions, use_fitness, ring_spec,
+                   commands, results, profile=False, seed=None):
+    # One thread per worker, the cores are shared between the workers
+    torch.set_num_threads(1)
+    ring = SharedRing.attach(ring_spec)
+    rng = random.Random(seed)
+    game = TGame.TetrisGame(headless=True, seed=rng.getrandbits(64))
+    model = model_class(input_size)
+    profiler = Profiler(profile)
+    profiler.instrument_game(game)
+    profiler.instrument_model(model)
+    while True:
+        command, arg = commands.get()
+        if command == "weights":
+            model.load_state_dict(arg)
+        elif command == "epsilon":
+            prob_random = arg
+        elif command == "collect":
+            count = run_episodes(game, model, arg, ring, prob_random, random_actions, use_fitness, rng)
+            results.put((worker_id, count, profiler.to_dict() if profile else None))
+            profiler.reset()
+        elif command == "stop":
+            break
+    game.set_observation_buffer(None)
+    ring.close()
+
+
+###########
+# Manager #
+###########
+class RolloutWorkers:
+    # capacity: transitions a worker can get ahead of the learner (size of its ring)
+    # profiler: the stats of the workers are merged into it after every round (if it is enabled)
+    # seed: every worker gets its own seed derived from it (None: unseeded, not reproducible)
+    def __init__(self, agent, worker_count=None, capacity=20_000, use_fitness=False, profiler=None, seed=None):
+        self.worker_count = worker_count or os.cpu_count()
+        self.capacity = capacity
+        self.profiler = profiler
+        profile = profiler is not None and profiler.enabled
+        # CUDA cannot be forked, always spawn fresh interpreters
+        context = mp.get_context("spawn")
+        self.results = context.Queue()
+        self.commands = []
+        self.rings = []
+        self.processes = []
+        # Workers still playing the episodes of the current round, transitions they reported
+        self.busy = 0
+        self.collected = 0
+        for worker_id in range(self.worker_count):
+            ring = SharedRing(capacity, context.Lock())
+            commands = context.Queue()
+            process = context.Process(target=rollout_worker, daemon=True,
+                                      args=(worker_id, type(agent.model), agent.model.dense1.in_features,
+                                            agent.prob_random, agent.random_actions, use_fitness, ring.get_spec(),
+                                            commands, self.results, profile,
+                                            None if seed is None else f"{seed}/{worker_id}"))
+            process.start()
+            self.commands.append(commands)
+            self.rings.append(ring)
+            self.processes.append(process)
+        self.update_weights(agent.model)
+
+    # Send the current weights to every worker (call after each training round)
+    def update_weights(self, model):
+        state_dict = {key: value.detach().cpu().clone() for key, value in model.state_dict().items()}
+        for commands in self.commands:
+            commands.put(("weights", state_dict))
+
+    def update_epsilon(self, prob_random):
+        for commands in self.commands:
+            commands.put(("epsilon", prob_random))
+
+    # Play the episodes on the workers (split between them), returns right away
+    def start(self, episodes):
+        self.collected = 0
+        for worker_id, commands in enumerate(self.commands):
+            worker_episodes = episodes // self.worker_count + (1 if worker_id < episodes % self.worker_count else 0)
+            if worker_episodes:
+                commands.put(("collect", worker_episodes))
+                self.busy += 1
+
+    # True while a worker is still playing, waits up to timeout for one to finish
+    # Once it returns False every transition of the round is published, drain the rings one last time
+    def collecting(self, timeout=0.001):
+        if self.busy:
+            try:
+                worker_id, count, phases = self.results.get(timeout=timeout)
+            except queue.Empty:
+                return True
+            self.busy -= 1
+            self.collected += count
+            if phases:
+                self.profiler.merge(phases)
+        return self.busy > 0
+
+    def close(self):
+        for commands in self.commands:
+            commands.put(("stop", None))
+        for process in self.processes:
+            process.join()
+        for ring in self.rings:
+            ring.close()
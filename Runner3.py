@@ -2,6 +2,10 @@ import TetrisGame
 import random
 import time
 from Pytorch_Agent2 import DQN_Agent
+from RolloutWorkers import RolloutWorkers
+from SharedTransport import drain
+from BackgroundTrainer import BackgroundTrainer
+from Profiler import Profiler
 
 
 def run_game(game, agent, render):
@@ -23,9 +27,46 @@ def run_game(game, agent, render):
     return experience
 
 
+# Number of rollout processes, 0 plays the episodes here (with the display)
+ROLLOUT_WORKERS = 0
+# Train on minibatches in the background while the workers play
+BACKGROUND_TRAINING = False
+# Time the env steps, inference, replay inserts, training and rendering (see Profiler.py)
+PROFILE = False
+
 if __name__ == "__main__":
+    profiler = Profiler(PROFILE)
+    if ROLLOUT_WORKERS:
+        dqn_agent = DQN_Agent(TetrisGame.GRID_ROW_COUNT * TetrisGame.GRID_COL_COUNT)
+        profiler.instrument_agent(dqn_agent)
+        # The workers' transitions go straight into the memory (see SharedTransport.drain)
+        profiler.instrument(dqn_agent.memory, "add_batch", "replay_insert")
+        workers = RolloutWorkers(dqn_agent, ROLLOUT_WORKERS, use_fitness=True, profiler=profiler)
+        if BACKGROUND_TRAINING:
+            trainer = BackgroundTrainer(dqn_agent)
+            trainer.start()
+            while True:
+                workers.start(25)
+                while workers.collecting():
+                    trainer.take_in_rings(workers.rings)
+                trainer.take_in_rings(workers.rings)
+                with trainer.lock:
+                    workers.update_weights(dqn_agent.model)
+                print(trainer.get_stats())
+                profiler.maybe_report()
+        while True:
+            workers.start(25)
+            while workers.collecting():
+                drain(workers.rings, dqn_agent.memory)
+            drain(workers.rings, dqn_agent.memory)
+            dqn_agent.train()
+            workers.update_weights(dqn_agent.model)
+            profiler.maybe_report()
+
     game = TetrisGame.TetrisGame()
     dqn_agent = DQN_Agent(game.obs_size)
+    profiler.instrument_game(game)
+    profiler.instrument_agent(dqn_agent)
     while True:
         for i in range(25):
             experience = run_game(game, dqn_agent, render=True)
@@ -33,3 +74,4 @@ if __name__ == "__main__":
             # something to be gained
             dqn_agent.take_in_data(experience)
         dqn_agent.train()
+        profiler.maybe_report()
@@ -1,34 +1,19 @@
-import TetrisGame, TetrisUtils
+import TetrisGame, TetrisUtils, TetrisSearch
 from TetrisSettings import *
 import time
-import json
+from TransitionStore import TransitionWriter
 
-buffer_count = 0
-buffer_curr = 0
-buffer_max = 1000
-buffer = {}
+writer = None
 
 
-def json_write(state, action, reward, next_state):
-    global buffer, buffer_count, buffer_curr, buffer_max
-    if buffer_curr >= buffer_max:
-        buffer_curr = 0
-        buffer_count += 1
-        # Write to file
-        with open("models/neo/supervised_data_1.json", "w") as f:
-            json.dump(buffer, f, indent=4)
-        # Debug
-        print(f">> Written {buffer_count * buffer_max}x JSON datasets to file!")
-    buffer["data_count"] = buffer.get("data_count", 0) + 1
-    obs_arr = buffer.get("observations", [])
-    obs_arr.append({
-        "state": state,
-        "action": action,
-        "reward": reward,
-        "next": next_state
-    })
-    buffer["observations"] = obs_arr
-    buffer_curr += 1
+def data_write(state, action, reward, next_state):
+    global writer
+    if writer is None:
+        writer = TransitionWriter("models/neo/supervised_data_1.tds")
+    writer.write(state, action, reward, next_state)
+    # Debug (a chunk was just flushed)
+    if writer.chunk_count == 0:
+        print(f">> Written {writer.count}x transitions to file!")
 
 
 def run_game(game, agent):
@@ -48,7 +33,7 @@ def run_game(game, agent):
                     # Need: state, action, reward, next_state
                     state, reward, _, _ = game.step(action, True)
                     next_state = TetrisUtils.get_board_with_tile(game.board, game.tile_shape, (game.tile_x, game.tile_y), True)
-                    json_write(str(state), action, reward, str(next_state))
+                    data_write(state, action, reward, next_state)
         else:
             game.reset()
 
@@ -56,13 +41,22 @@ def run_game(game, agent):
 class ActionAgent:
     def __init__(self, tetris):
         self.tetris = tetris
+        # Lookahead over the tile bank, see SEARCH_* in TetrisSettings
+        self.search = TetrisSearch.LookaheadSearch() if SEARCH_EXPERT else None
 
     def predict(self):
         # State, action, next_state, reward, done?
+        if self.search is not None:
+            return self.search.get_game_actions(self.tetris)
         return TetrisUtils.get_best_actions(self.tetris.board, self.tetris.tile_shape, TILE_SHAPES[self.tetris.get_next_tile()], (self.tetris.tile_x, self.tetris.tile_y))
 
 
 if __name__ == "__main__":
     game = TetrisGame.TetrisGame()
     agent = ActionAgent(game)
-    run_game(game, agent)
+    try:
+        run_game(game, agent)
+    finally:
+        # run_game only ends with Ctrl-C, keep the staged transitions
+        if writer is not None:
+            writer.close()
@@ -0,0 +1,259 @@
+# Shared memory transport of transitions from rollout processes to the learner
+# One ring buffer per worker (single producer, single consumer), laid out as
+# TRANSITION_LAYOUT after a small header of two counters:
+#   written: transitions published by the worker
+#   read:    transitions released by the learner
+# Both only ever grow, slot = counter % capacity. The worker fills slots in place
+# and publishes them in batches, the learner gets NumPy views of the published
+# slots (no pickling, no copies) and releases them once they are stored.
+# The counters are updated under a lock, which also orders the memory writes
+# around them.
+#
+# RolloutWorkers writes into one ring per worker, the runners drain() them
+# into the agent's ReplayMemory.
+#
+# python SharedTransport.py  (throughput of the rings against pickling through a queue)
+
+import time
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from AI_Club_Tetris.TetrisSettings import *
+
+OBS_SIZE = GRID_ROW_COUNT * GRID_COL_COUNT
+
+# Layout of the transitions in shared memory: (name, dtype, shape of one entry)
+TRANSITION_LAYOUT = [
+    ("obs", np.uint8, (OBS_SIZE,)),
+    ("actions", np.int8, ()),
+    ("next_obs", np.uint8, (OBS_SIZE,)),
+    ("rewards", np.float32, ()),
+    ("dones", np.bool_, ()),
+]
+
+HEADER_SIZE = 64
+WRITTEN = 0
+READ = 1
+
+
+def get_transition_nbytes(capacity):
+    return sum(np.dtype(dtype).itemsize * int(np.prod(shape)) * capacity for _, dtype, shape in TRANSITION_LAYOUT)
+
+
+def get_transition_views(buffer, capacity):
+    views = {}
+    offset = 0
+    for name, dtype, shape in TRANSITION_LAYOUT:
+        views[name] = np.ndarray((capacity,) + shape, dtype=dtype, buffer=buffer, offset=offset)
+        offset += views[name].nbytes
+    return views
+
+
+class SharedRing:
+    # name: attach to an existing ring (in the workers), None creates it
+    # lock: a multiprocessing lock shared by both ends
+    def __init__(self, capacity, lock, name=None):
+        self.capacity = capacity
+        self.lock = lock
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=HEADER_SIZE + get_transition_nbytes(capacity))
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.counters = np.ndarray(2, dtype=np.int64, buffer=self.shm.buf)
+        if self.owner:
+            self.counters[:] = 0
+        self.views = get_transition_views(self.shm.buf[HEADER_SIZE:], capacity)
+        # Producer side: transitions written but not published yet
+        self.pending = 0
+
+    # What a worker needs to attach (picklable)
+    def get_spec(self):
+        return self.capacity, self.lock, self.shm.name
+
+    @classmethod
+    def attach(cls, spec):
+        capacity, lock, name = spec
+        return cls(capacity, lock, name)
+
+    ############
+    # Producer #
+    ############
+    # Slot of the next transition, waits while the learner is a whole ring behind
+    def next_slot(self):
+        written = self.counters[WRITTEN] + self.pending
+        while written - self.counters[READ] >= self.capacity:
+            self.publish()
+            time.sleep(0.0001)
+        return written % self.capacity
+
+    def write(self, obs, action, next_obs, reward, done):
+        i = self.next_slot()
+        views = self.views
+        views["obs"][i] = obs
+        views["actions"][i] = action
+        views["next_obs"][i] = next_obs
+        views["rewards"][i] = reward
+        views["dones"][i] = done
+        self.commit()
+
+    # The transition at next_slot() is filled in
+    def commit(self):
+        self.pending += 1
+
+    def publish(self):
+        if self.pending:
+            with self.lock:
+                self.counters[WRITTEN] += self.pending
+            self.pending = 0
+
+    ############
+    # Consumer #
+    ############
+    # >> Returns: (obs, actions, next_obs, rewards, dones) views of the oldest published
+    # transitions (contiguous, so they stop at the end of the ring), release them when done
+    def poll(self, max_count=None):
+        with self.lock:
+            read, written = self.counters[READ], self.counters[WRITTEN]
+        start = read % self.capacity
+        count = min(written - read, self.capacity - start)
+        if max_count is not None:
+            count = min(count, max_count)
+        end = start + count
+        views = self.views
+        return (views["obs"][start:end], views["actions"][start:end], views["next_obs"][start:end],
+                views["rewards"][start:end], views["dones"][start:end])
+
+    def release(self, count):
+        with self.lock:
+            self.counters[READ] += count
+
+    def close(self):
+        if not self.owner:
+            self.publish()
+        self.views = None
+        self.counters = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+# Moves every published transition of the rings into a ReplayMemory (e.g. DQN_Agent.memory)
+# >> Returns: transitions moved
+def drain(rings, memory):
+    total = 0
+    for ring in rings:
+        while True:
+            batch = ring.poll()
+            count = len(batch[1])
+            if not count:
+                break
+            memory.add_batch(*batch)
+            ring.release(count)
+            total += count
+    return total
+
+
+#############
+# Benchmark #
+#############
+# Observations of a seeded game, replayed by the benchmark workers so that the
+# transport is measured, not the game
+def get_sample_transitions(count):
+    import random
+    from AI_Club_Tetris import TetrisGame as TGame
+    game = TGame.TetrisGame(headless=True, seed=0)
+    rng = random.Random(0)
+    transitions = []
+    obs = game.get_observation()
+    while len(transitions) < count:
+        action = rng.randint(0, 8)
+        next_obs, reward, done, _ = game.step(action)
+        transitions.append((obs, action, next_obs, reward, done))
+        obs = next_obs
+        if done:
+            game.reset()
+            obs = game.get_observation()
+    return transitions
+
+
+def pickle_worker(queue, steps, batch_size, barrier):
+    transitions = get_sample_transitions(1000)
+    barrier.wait()
+    for start in range(0, steps, batch_size):
+        queue.put([transitions[i % len(transitions)] for i in range(start, min(start + batch_size, steps))])
+    queue.put(None)
+
+
+def ring_worker(spec, steps, batch_size, barrier):
+    transitions = get_sample_transitions(1000)
+    # Same arrays the rollout workers write (TetrisGame.write_observation fills slots directly)
+    arrays = [(np.asarray(obs, dtype=np.uint8).ravel(), action, np.asarray(next_obs, dtype=np.uint8).ravel(),
+               reward, done) for obs, action, next_obs, reward, done in transitions]
+    ring = SharedRing.attach(spec)
+    barrier.wait()
+    for i in range(steps):
+        ring.write(*arrays[i % len(arrays)])
+        if ring.pending == batch_size:
+            ring.publish()
+    ring.close()
+
+
+def run_benchmark(worker_count=2, steps=50_000, batch_size=256):
+    from AI_Club_Tetris.ReplayMemory import ReplayMemory
+    context = mp.get_context("spawn")
+    step_nbytes = get_transition_nbytes(1)
+    results = {}
+
+    # Pickle baseline: nested lists through a queue, converted on arrival
+    memory = ReplayMemory(100_000, OBS_SIZE)
+    queue = context.Queue(maxsize=64)
+    # The clock starts once every worker is ready
+    barrier = context.Barrier(worker_count + 1)
+    processes = [context.Process(target=pickle_worker, args=(queue, steps, batch_size, barrier))
+                 for _ in range(worker_count)]
+    for process in processes:
+        process.start()
+    barrier.wait()
+    start = time.perf_counter()
+    finished = 0
+    while finished < worker_count:
+        data = queue.get()
+        if data is None:
+            finished += 1
+            continue
+        memory.add_batch(*zip(*data))
+    results["pickle"] = time.perf_counter() - start
+    for process in processes:
+        process.join()
+
+    # Shared rings: views straight into the replay memory
+    memory = ReplayMemory(100_000, OBS_SIZE)
+    barrier = context.Barrier(worker_count + 1)
+    rings = [SharedRing(4 * batch_size, context.Lock()) for _ in range(worker_count)]
+    processes = [context.Process(target=ring_worker, args=(ring.get_spec(), steps, batch_size, barrier))
+                 for ring in rings]
+    for process in processes:
+        process.start()
+    barrier.wait()
+    start = time.perf_counter()
+    moved = 0
+    while moved < worker_count * steps:
+        count = drain(rings, memory)
+        moved += count
+        if not count:
+            time.sleep(0.0001)
+    results["shared_memory"] = time.perf_counter() - start
+    for process in processes:
+        process.join()
+    for ring in rings:
+        ring.close()
+
+    total = worker_count * steps
+    for name, elapsed in results.items():
+        print(f"{name:<14} {total / elapsed:>12,.0f} steps/sec {total * step_nbytes / elapsed / 1e6:>10,.1f} MB/sec")
+    return results
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,159 @@
+# Bitboard helpers for the TetrisGame.py
+# Keep the coupling to a minimum
+#
+# A bitboard is a list of GRID_ROW_COUNT integers (top row first),
+# bit x of a row is set when column x of that row is filled.
+
+from AI_Club_Tetris.TetrisSettings import *
+
+FULL_ROW = (1 << GRID_COL_COUNT) - 1
+# Number of filled cells for every possible row
+POPCOUNT = [bin(mask).count("1") for mask in range(FULL_ROW + 1)]
+
+
+##############
+# Tile Masks #
+##############
+def get_tile_key(tile_shape):
+    return tuple(tuple(row) for row in tile_shape)
+
+
+def get_row_mask(row):
+    mask = 0
+    for x, val in enumerate(row):
+        if val != 0:
+            mask |= 1 << x
+    return mask
+
+
+# Tile shape (as tuples) -> row masks relative to the tile's top-left corner
+TILE_MASKS = {}
+
+
+def get_tile_masks(tile_shape):
+    key = get_tile_key(tile_shape)
+    masks = TILE_MASKS.get(key)
+    if masks is None:
+        masks = TILE_MASKS[key] = [get_row_mask(row) for row in tile_shape]
+    return masks
+
+
+# Precompute all the rotations of all the tiles
+for _shape in TILE_SHAPES.values():
+    for _ in range(4):
+        get_tile_masks(_shape)
+        _shape = list(zip(*reversed(_shape)))
+
+
+###########################
+# Board Helper Algorithms #
+###########################
+def from_board(board):
+    return [get_row_mask(row) for row in board]
+
+
+def to_board(rows):
+    return [[(row >> x) & 1 for x in range(GRID_COL_COUNT)] for row in rows]
+
+
+def check_collision(rows, tile_shape, offsets):
+    return check_collision_masks(rows, get_tile_masks(tile_shape), offsets)
+
+
+# Same with the masks of get_tile_masks, keep them around to skip the tile lookup
+# (the tiles have no empty columns: a mask shifted past FULL_ROW sticks out on the right)
+def check_collision_masks(rows, masks, offsets):
+    offset_x, offset_y = offsets
+    if offset_x < 0 or offset_y + len(masks) > GRID_ROW_COUNT:
+        return True
+    for cy, mask in enumerate(masks):
+        mask <<= offset_x
+        if mask > FULL_ROW or rows[cy + offset_y] & mask:
+            return True
+    return False
+
+
+def get_effective_height(rows, tile_shape, offsets):
+    return get_effective_height_masks(rows, get_tile_masks(tile_shape), offsets)
+
+
+def get_effective_height_masks(rows, masks, offsets):
+    offset_x, offset_y = offsets
+    while not check_collision_masks(rows, masks, (offset_x, offset_y)):
+        offset_y += 1
+    return offset_y - 1
+
+
+# Returns a copy of the rows with the tile locked in
+def get_rows_with_tile(rows, tile_shape, offsets):
+    rows = rows[:]
+    for cy, mask in enumerate(get_tile_masks(tile_shape)):
+        rows[cy + offsets[1]] |= mask << offsets[0]
+    return rows
+
+
+# Same observation as TetrisUtils.get_board_with_tile(..., flattened=True)
+def get_board_with_tile(rows, tile_shape, offsets):
+    board = to_board(rows)
+    for y, row in enumerate(tile_shape):
+        for x, val in enumerate(row):
+            if val != 0:
+                board[y + offsets[1]][x + offsets[0]] = val
+    return board
+
+
+def get_future_rows_with_tile(rows, tile_shape, offsets):
+    return get_rows_with_tile(rows, tile_shape, (offsets[0], get_effective_height(rows, tile_shape, offsets)))
+
+
+# Returns (new rows, indices of the rows that were kept, lines cleared)
+def get_rows_and_lines_cleared(rows):
+    kept = [y for y, row in enumerate(rows) if row != FULL_ROW]
+    score_count = GRID_ROW_COUNT - len(kept)
+    if score_count == 0:
+        return rows, kept, 0
+    return [0] * score_count + [rows[y] for y in kept], kept, score_count
+
+
+###########################
+# Lee's Fitness Algorithm #
+###########################
+# Same value as TetrisUtils.get_fitness_score, does not modify the rows
+def get_fitness_score(rows):
+    rows, _, score_count = get_rows_and_lines_cleared(rows)
+    heights = get_col_heights(rows)
+    score = WEIGHT_LINE_CLEARED * score_count
+    score += WEIGHT_AGGREGATE_HEIGHT * sum(heights)
+    score += WEIGHT_HOLES * get_hole_count(rows)
+    score += WEIGHT_BUMPINESS * get_bumpiness(heights)
+    return score
+
+
+def get_col_heights(rows):
+    heights = [0] * GRID_COL_COUNT
+    seen = 0
+    for neg_height, row in enumerate(rows):
+        new = row & ~seen
+        seen |= row
+        # Walk the newly seen columns, lowest bit first
+        while new:
+            low = new & -new
+            heights[low.bit_length() - 1] = GRID_ROW_COUNT - neg_height
+            new ^= low
+        if seen == FULL_ROW:
+            break
+    return heights
+
+
+# Empty cells with a filled cell somewhere above them
+def get_hole_count(rows):
+    holes = 0
+    seen = 0
+    for row in rows:
+        holes += POPCOUNT[seen & ~row & FULL_ROW]
+        seen |= row
+    return holes
+
+
+def get_bumpiness(heights):
+    return sum(abs(heights[i - 1] - heights[i]) for i in range(1, GRID_COL_COUNT))
@@ -0,0 +1,159 @@
+# Hash-consed boards and memoized evaluations for the TetrisGame.py
+# Keep the coupling to a minimum
+#
+# A board is a tuple of row bitmasks (see TetrisBitboard): immutable and
+# hashable. intern() hands out one shared instance per distinct board, so equal
+# boards reached by different moves are the same object (dict lookups on them
+# stop at the identity check) and share their cache entries.
+#
+# BoardCache memoizes, in bounded LRUs with hit / miss counts:
+#   boards:   board -> shared instance and (aggregate height, holes, bumpiness) of Lee's fitness
+#   landings: (board, tile shape, x, y) -> (board after the tile locked and lines cleared, lines)
+# A landing is keyed without y when the tile starts above the stack (it then
+# lands in the same place from any height), so every fall of a tile shares it.
+# Lines are cleared before the features are looked up: the placements that
+# clear lines into the same stack share their features as well.
+#
+# Opt-in: pass a BoardCache to TetrisGame (several games can share one). A cache
+# is not thread-safe, use it from a single thread.
+
+from collections import OrderedDict
+from AI_Club_Tetris import TetrisBitboard as TBits
+from AI_Club_Tetris import TetrisBoardStats as TStats
+from AI_Club_Tetris.TetrisSettings import *
+
+
+# Single-threaded
+class LRUCache:
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # >> Returns: the cached value, None on a miss
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self.entries), "size": self.size}
+
+
+# >> Returns: (aggregate height, holes, bumpiness) of a board
+def get_board_features(board):
+    cols = [0] * GRID_COL_COUNT
+    for y, row in enumerate(board):
+        x = 0
+        while row:
+            if row & 1:
+                cols[x] |= 1 << y
+            row >>= 1
+            x += 1
+    heights = []
+    holes = 0
+    for col in cols:
+        height, col_holes = TStats.get_column_stats(col)
+        heights.append(height)
+        holes += col_holes
+    return sum(heights), holes, sum(abs(heights[i - 1] - heights[i]) for i in range(1, GRID_COL_COUNT))
+
+
+# Same order of operations as TetrisUtils.get_fitness_score (same floats)
+def get_fitness_from_features(features, lines):
+    aggregate_height, holes, bumpiness = features
+    score = WEIGHT_LINE_CLEARED * lines
+    score += WEIGHT_AGGREGATE_HEIGHT * aggregate_height
+    score += WEIGHT_HOLES * holes
+    score += WEIGHT_BUMPINESS * bumpiness
+    return score
+
+
+# Index of the highest filled row (GRID_ROW_COUNT when the board is empty)
+def get_stack_top(board):
+    for y, row in enumerate(board):
+        if row:
+            return y
+    return GRID_ROW_COUNT
+
+
+class BoardCache:
+    # size: entries of every LRU
+    def __init__(self, size=BOARD_CACHE_SIZE):
+        # board -> [shared instance, features (None until needed)]
+        self.boards = LRUCache(size)
+        self.landings = LRUCache(size)
+        self.feature_hits = 0
+        self.feature_misses = 0
+
+    def get_entry(self, rows):
+        board = tuple(rows)
+        entry = self.boards.get(board)
+        if entry is None:
+            entry = [board, None]
+            self.boards.put(board, entry)
+        return entry
+
+    # >> Returns: the shared instance of the board (any sequence of row bitmasks)
+    def intern(self, rows):
+        return self.get_entry(rows)[0]
+
+    def get_features(self, board):
+        entry = self.get_entry(board)
+        if entry[1] is None:
+            self.feature_misses += 1
+            entry[1] = get_board_features(entry[0])
+        else:
+            self.feature_hits += 1
+        return entry[1]
+
+    # Same value as TetrisUtils.get_fitness_score
+    # board: lines already cleared, lines: lines cleared on the way to it
+    def get_fitness(self, board, lines=0):
+        return get_fitness_from_features(self.get_features(board), lines)
+
+    # Drops the tile from offsets and locks it
+    # >> Returns: (board after clearing lines, lines cleared)
+    def get_landing(self, board, tile_shape, offsets):
+        offset_x, offset_y = offsets
+        tile_key = TBits.get_tile_key(tile_shape)
+        above_stack = offset_y + len(tile_key) <= get_stack_top(board)
+        key = (board, tile_key, offset_x, None if above_stack else offset_y)
+        landing = self.landings.get(key)
+        if landing is None:
+            offset_y = TBits.get_effective_height(board, tile_shape, offsets)
+            rows, _, lines = TBits.get_rows_and_lines_cleared(TBits.get_rows_with_tile(list(board), tile_shape,
+                                                                                       (offset_x, offset_y)))
+            landing = (self.intern(rows), lines)
+            self.landings.put(key, landing)
+        return landing
+
+    # Fitness of the board once the tile dropped from offsets (same value as TetrisUtils.get_fitness_score)
+    def get_future_fitness(self, board, tile_shape, offsets):
+        next_board, lines = self.get_landing(board, tile_shape, offsets)
+        return self.get_fitness(next_board, lines)
+
+    def clear(self):
+        self.boards.clear()
+        self.landings.clear()
+
+    def get_stats(self):
+        lookups = self.feature_hits + self.feature_misses
+        return {"boards": self.boards.get_stats(), "landings": self.landings.get_stats(),
+                "features": {"hits": self.feature_hits, "misses": self.feature_misses,
+                             "hit_rate": self.feature_hits / lookups if lookups else 0.0}}
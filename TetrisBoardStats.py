@@ -0,0 +1,133 @@
+# Incremental board statistics for the TetrisGame.py
+# Keep the coupling to a minimum
+#
+# Column heights, holes, bumpiness and row fill counts, kept up to date as
+# tiles lock and lines clear (only the touched columns / rows are updated),
+# so Lee's fitness no longer needs a scan of the board.
+#
+# Every column is also kept as a bitmask (bit y set when row y is filled, top
+# row first), its height and hole count then come straight from the mask.
+
+from AI_Club_Tetris import TetrisBitboard as TBits
+from AI_Club_Tetris.TetrisSettings import *
+
+# Tile shape (as tuples) -> ([(cx, column mask relative to the tile's top), ...], [filled cells per tile row])
+TILE_COLUMNS = {}
+
+
+def get_tile_columns(tile_shape):
+    key = TBits.get_tile_key(tile_shape)
+    columns = TILE_COLUMNS.get(key)
+    if columns is None:
+        masks = [(cx, sum(1 << cy for cy, row in enumerate(key) if row[cx])) for cx in range(len(key[0]))]
+        columns = TILE_COLUMNS[key] = ([(cx, mask) for cx, mask in masks if mask],
+                                       [sum(1 for val in row if val) for row in key])
+    return columns
+
+
+# >> Returns: (height, holes) of a column mask
+def get_column_stats(col):
+    if not col:
+        return 0, 0
+    height = GRID_ROW_COUNT - ((col & -col).bit_length() - 1)
+    return height, height - bin(col).count("1")
+
+
+class BoardStats:
+    def __init__(self):
+        self.cols = [0] * GRID_COL_COUNT
+        self.col_heights = [0] * GRID_COL_COUNT
+        self.col_holes = [0] * GRID_COL_COUNT
+        self.row_fill = [0] * GRID_ROW_COUNT
+        self.aggregate_height = 0
+        self.holes = 0
+        self.bumpiness = 0
+
+    @classmethod
+    def from_board(cls, board):
+        stats = cls()
+        for y, row in enumerate(board):
+            for x, val in enumerate(row):
+                if val != 0:
+                    stats.cols[x] |= 1 << y
+                    stats.row_fill[y] += 1
+        stats.update_columns(range(GRID_COL_COUNT))
+        return stats
+
+    def copy(self):
+        stats = BoardStats.__new__(BoardStats)
+        stats.cols = self.cols[:]
+        stats.col_heights = self.col_heights[:]
+        stats.col_holes = self.col_holes[:]
+        stats.row_fill = self.row_fill[:]
+        stats.aggregate_height = self.aggregate_height
+        stats.holes = self.holes
+        stats.bumpiness = self.bumpiness
+        return stats
+
+    # Compact immutable state (see TetrisGame.snapshot), the rest is derived on restore
+    def snapshot(self):
+        return tuple(self.cols), tuple(self.row_fill)
+
+    @classmethod
+    def restore(cls, snap):
+        stats = cls()
+        stats.cols = list(snap[0])
+        stats.row_fill = list(snap[1])
+        stats.update_columns(range(GRID_COL_COUNT))
+        return stats
+
+    def update_columns(self, columns):
+        for x in columns:
+            height, holes = get_column_stats(self.cols[x])
+            self.aggregate_height += height - self.col_heights[x]
+            self.holes += holes - self.col_holes[x]
+            self.col_heights[x] = height
+            self.col_holes[x] = holes
+        heights = self.col_heights
+        self.bumpiness = sum(abs(heights[i - 1] - heights[i]) for i in range(1, GRID_COL_COUNT))
+
+    # Lock a tile at offsets
+    # >> Returns: the rows it filled up (top to bottom)
+    def add_tile(self, tile_shape, offsets):
+        offset_x, offset_y = offsets
+        columns, row_counts = get_tile_columns(tile_shape)
+        for cx, mask in columns:
+            self.cols[cx + offset_x] |= mask << offset_y
+        full_rows = []
+        for cy, count in enumerate(row_counts):
+            self.row_fill[cy + offset_y] += count
+            if self.row_fill[cy + offset_y] == GRID_COL_COUNT:
+                full_rows.append(cy + offset_y)
+        self.update_columns([cx + offset_x for cx, _ in columns])
+        return full_rows
+
+    # rows: sorted top to bottom (as returned by add_tile)
+    def clear_rows(self, rows):
+        for y in rows:
+            del self.row_fill[y]
+            self.row_fill.insert(0, 0)
+            # Drop the bit of row y, the rows above it move down by one
+            above = (1 << y) - 1
+            below = ~((1 << (y + 1)) - 1)
+            for x in range(GRID_COL_COUNT):
+                col = self.cols[x]
+                self.cols[x] = (col & below) | ((col & above) << 1)
+        self.update_columns(range(GRID_COL_COUNT))
+
+    # Same value as TetrisUtils.get_fitness_score (same order of operations, so the same float)
+    # lines: lines cleared on the way to this board
+    def get_fitness(self, lines=0):
+        score = WEIGHT_LINE_CLEARED * lines
+        score += WEIGHT_AGGREGATE_HEIGHT * self.aggregate_height
+        score += WEIGHT_HOLES * self.holes
+        score += WEIGHT_BUMPINESS * self.bumpiness
+        return score
+
+    # Fitness of the board if the tile was locked at offsets (this board is not modified)
+    def get_future_fitness(self, tile_shape, offsets):
+        stats = self.copy()
+        full_rows = stats.add_tile(tile_shape, offsets)
+        if full_rows:
+            stats.clear_rows(full_rows)
+        return stats.get_fitness(len(full_rows))
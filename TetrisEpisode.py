@@ -0,0 +1,116 @@
+# Replayable episodes for the TetrisGame.py
+# Keep the coupling to a minimum
+#
+# A game reset with a seed is fully determined by its actions, so an episode is
+# logged as its seed and action list (plus the final score / lines to check a
+# replay against). Only stepped games can be replayed: the UI timer of a game
+# with a display drops tiles on its own.
+#
+# Log format: one JSON object per line
+# {"seed": 42, "bitboard": false, "actions": "0815...", "score": 125.0, "lines": 12}
+# (actions are indexes of ACTIONS, one digit each)
+#
+# python TetrisEpisode.py episodes.jsonl  (replays every episode, checks them and reports steps/sec)
+
+import sys
+import json
+import time
+import random
+from AI_Club_Tetris import TetrisGame as TGame
+from AI_Club_Tetris.TetrisSettings import *
+
+
+def new_seed():
+    return random.SystemRandom().randrange(2 ** 32)
+
+
+def encode_actions(actions):
+    return "".join(str(int(action)) for action in actions)
+
+
+def decode_actions(actions):
+    return [int(action) for action in actions]
+
+
+def load_episodes(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# Steps a game and logs its episodes (append-only file, if a path is given)
+class EpisodeRecorder:
+    def __init__(self, game, path=None):
+        self.game = game
+        self.path = path
+        self.episodes = []
+        self.seed = None
+        self.actions = []
+
+    # seed: None draws a new one
+    def reset(self, seed=None):
+        self.seed = new_seed() if seed is None else seed
+        self.actions = []
+        return self.game.reset(self.seed)
+
+    # Same as TetrisGame.step, the episode is logged when the game is over
+    def step(self, action=0, use_fitness=False):
+        if self.seed is None:
+            self.reset()
+        self.actions.append(action)
+        result = self.game.step(action, use_fitness)
+        if result[2]:
+            self.finish()
+        return result
+
+    def finish(self):
+        episode = {
+            "seed": self.seed,
+            "bitboard": self.game.bitboard,
+            "actions": encode_actions(self.actions),
+            "score": self.game.score,
+            "lines": self.game.lines,
+        }
+        self.episodes.append(episode)
+        if self.path is not None:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(episode) + "\n")
+        self.seed = None
+        return episode
+
+
+# Re-executes an episode on a headless game (reused if given)
+# >> Returns: (score, lines, matches the logged score / lines)
+def replay_episode(episode, game=None):
+    if game is None:
+        game = TGame.TetrisGame(headless=True, bitboard=episode.get("bitboard", USE_BITBOARD))
+    game.reset(episode["seed"])
+    for action in decode_actions(episode["actions"]):
+        game.step(action)
+    matches = game.score == episode["score"] and game.lines == episode["lines"]
+    return game.score, game.lines, matches
+
+
+# >> Returns: (mismatched episode indexes, steps, seconds)
+def replay_episodes(episodes):
+    games = {}
+    mismatches = []
+    steps = 0
+    start = time.perf_counter()
+    for i, episode in enumerate(episodes):
+        bitboard = episode.get("bitboard", USE_BITBOARD)
+        if bitboard not in games:
+            games[bitboard] = TGame.TetrisGame(headless=True, bitboard=bitboard)
+        _, _, matches = replay_episode(episode, games[bitboard])
+        if not matches:
+            mismatches.append(i)
+        steps += len(episode["actions"])
+    return mismatches, steps, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    episodes = load_episodes(sys.argv[1])
+    mismatches, steps, elapsed = replay_episodes(episodes)
+    print(f"Replayed {len(episodes)} episodes ({steps} steps) in {elapsed:.2f}s, {steps / elapsed:.0f} steps/sec")
+    for i in mismatches:
+        print(f"Episode {i} (seed {episodes[i]['seed']}) does not match its logged score / lines")
+    sys.exit(1 if mismatches else 0)
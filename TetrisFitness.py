@@ -0,0 +1,63 @@
+# Batched version of Lee's fitness algorithm (TetrisUtils.get_fitness_score)
+# Keep the coupling to a minimum
+#
+# Every function takes a stack of boards (K, 20, 10), any non-zero cell is filled.
+# Reference to https://codemyroad.wordpress.com/2013/04/14/tetris-ai-the-near-perfect-player/
+
+import numpy as np
+from AI_Club_Tetris.TetrisSettings import *
+
+COLUMN_BITS = np.arange(GRID_COL_COUNT)
+ROW_INDICES = np.arange(GRID_ROW_COUNT)
+
+
+# Bitboards (see TetrisBitboard) -> (K, 20, 10) boards
+def boards_from_rows(rows):
+    rows = np.asarray(rows, dtype=np.int64)
+    return ((rows[..., None] >> COLUMN_BITS) & 1).astype(np.uint8)
+
+
+# Get potential lines cleared (returns new boards, does not modify the input)
+def get_boards_and_lines_cleared(boards):
+    filled = boards != 0
+    full = filled.all(axis=2)
+    lines = full.sum(axis=1)
+    if not lines.any():
+        return filled, lines
+    # Full rows first (stable, so the others keep their order), then emptied
+    order = np.argsort(~full, axis=1, kind="stable")
+    filled = np.take_along_axis(filled, order[:, :, None], axis=1)
+    filled[ROW_INDICES[None, :] < lines[:, None]] = False
+    return filled, lines
+
+
+# Get height of each column
+def get_col_heights(filled):
+    return np.where(filled.any(axis=1), GRID_ROW_COUNT - filled.argmax(axis=1), 0)
+
+
+# Count of empty spaces below covers
+def get_hole_count(filled):
+    return (np.logical_or.accumulate(filled, axis=1) & ~filled).sum(axis=(1, 2))
+
+
+# Get the unevenness of the board
+def get_bumpiness(heights):
+    return np.abs(np.diff(heights, axis=1)).sum(axis=1)
+
+
+# >> Returns: aggregate height, holes, bumpiness and lines cleared, each (K,)
+def get_fitness_features(boards):
+    filled, lines = get_boards_and_lines_cleared(np.asarray(boards))
+    heights = get_col_heights(filled)
+    return heights.sum(axis=1), get_hole_count(filled), get_bumpiness(heights), lines
+
+
+def get_fitness_scores(boards):
+    aggregate_height, holes, bumpiness, lines = get_fitness_features(boards)
+    # Same order of operations as TetrisUtils.get_fitness_score (same floats)
+    score = WEIGHT_LINE_CLEARED * lines
+    score = score + WEIGHT_AGGREGATE_HEIGHT * aggregate_height
+    score += WEIGHT_HOLES * holes
+    score += WEIGHT_BUMPINESS * bumpiness
+    return score
@@ -1,42 +1,80 @@
 # Imports
 import sys
 import random
-import pygame
 import threading
+from collections import namedtuple
 from datetime import datetime
 from AI_Club_Tetris import TetrisUtils as TUtils
+from AI_Club_Tetris import TetrisBitboard as TBits
+from AI_Club_Tetris import TetrisBoardStats as TStats
+from AI_Club_Tetris import TetrisObservation as TObs
 from AI_Club_Tetris.TetrisSettings import *
 
+# Imported on demand so that headless games never load SDL
+pygame = None
+TRender = None
+
+# Immutable copy of the game state, see TetrisGame.snapshot
+GameSnapshot = namedtuple("GameSnapshot", ["board", "rows", "tile", "tile_shape", "tile_x", "tile_y", "tile_bank",
+                                           "score", "lines", "fitness", "active", "paused", "rng_state", "stats"])
+# What draw shows (and spectators, see TetrisSpectator), cells as in TetrisGame.get_display_cells
+Frame = namedtuple("Frame", ["cells", "score", "lines", "high_score", "high_score_lines", "fitness", "next_tile",
+                             "active", "paused"])
+
 
 class TetrisGame:
-    def __init__(self):
+    # headless: run the game logic only (no pygame, no timer, no render thread)
+    # bitboard: mirror the board as row bitmasks and use them for the game logic
+    # seed: seed of the tile generation (each game has its own random stream)
+    # board_cache: TetrisBoardCache.BoardCache for pseudo_step (opt-in), None scores from the board stats
+    def __init__(self, headless=not HAS_DISPLAY, bitboard=USE_BITBOARD, seed=None, board_cache=None):
         # Scores
         self.score = 0.0
         self.lines = 0
         self.high_score = 0.0
         self.high_score_lines = 0
         self.fitness = 0.0
+        self.headless = headless
+        self.bitboard = bitboard
+        self.random = random.Random(seed)
+        # See get_tile_masks
+        self.masks_shape = None
+        self.tile_masks = None
+        self.obs_size = GRID_ROW_COUNT * GRID_COL_COUNT  # would be + 1 if you are using the next block
+        # See set_observation_buffer
+        self.obs_buffer = None
+        self.obs_array = None
+        self.obs_next_tile = False
+        # See set_spectator
+        self.spectator = None
+        # Memoized landings and fitness for pseudo_step (single-threaded)
+        self.board_cache = board_cache
+
+        # Setup callback functions
+        self.on_score_changed_callbacks = []
 
         # Initialize display stuff
-        if HAS_DISPLAY:
+        if not self.headless:
+            global pygame, TRender
+            import pygame
+            from AI_Club_Tetris import TetrisRender as TRender
             self.log("Initializing system...", 3)
             pygame.init()
             pygame.font.init()
 
             self.screen = pygame.display.set_mode(size=(SCREEN_WIDTH, SCREEN_HEIGHT))
             self.log("Screen size set to: (" + str(SCREEN_WIDTH) + ", " + str(SCREEN_HEIGHT) + ")", 2)
-            self.obs_size = GRID_ROW_COUNT * GRID_COL_COUNT  # would be + 1 if you are using the next block
 
             # PyGame configurations
             pygame.event.set_blocked(pygame.MOUSEMOTION)
 
-            # Initialize game-related attributes
-            self.init_game()
-
-            # Setup callback functions
-            self.on_score_changed_callbacks = []
+        # Initialize game-related attributes
+        self.init_game()
+        # Fonts, static layer and sprites for draw
+        self.render_cache = TRender.RenderCache(self.grid_size) if not self.headless else None
 
-            # Start the game
+        # Start the game
+        if not self.headless:
             self.start()
 
     def init_game(self):
@@ -111,133 +149,31 @@ class TetrisGame:
                         self.key_actions[key]()
 
     # Called every tick after update
+    # Only what changed since the last frame is drawn and updated (see TetrisRender)
     def draw(self):
-        # Background layer
-        self.screen.fill(TUtils.get_color_tuple(COLORS.get("BACKGROUND_BLACK")))
-
-        ################
-        # Tetris Board #
-        ################
-        # Layered background layer
-        for a in range(GRID_COL_COUNT):
-            color = TUtils.get_color_tuple(COLORS.get("BACKGROUND_DARK" if a % 2 == 0 else "BACKGROUND_LIGHT"))
-            pygame.draw.rect(self.screen, color,
-                             (a * self.grid_size, 0, self.grid_size, SCREEN_HEIGHT))  # x, y, width, height
-
-        # Tetris (tile) layer
-        # Draw board first
-        self.draw_tiles(self.board)
-        # Draw hypothesized tile
-        if DISPLAY_PREDICTION:
-            self.draw_tiles(self.tile_shape, (
-                self.tile_x, TUtils.get_effective_height(self.board, self.tile_shape, (self.tile_x, self.tile_y))),
-                            True)
-        # Draw current tile
-        self.draw_tiles(self.tile_shape, (self.tile_x, self.tile_y))
-
-        #################
-        # Message Board #
-        #################
-        # Coordinates calculations
-        margin = 20  # 20 pixels margin
-        text_x_start = GRID_COL_COUNT * self.grid_size + margin
-        text_y_start = margin
-
-        # Title
-        message = MESSAGES.get("TITLE")
-        if not self.active:
-            message = "Game Over"
-        elif self.paused:
-            message = "= PAUSED ="
-        text_image = pygame.font.SysFont(FONT_NAME, 32).render(message, False, TUtils.get_color_tuple(COLORS.get("WHITE")))
-        self.screen.blit(text_image, (text_x_start, text_y_start))
-        text_y_start = 60
-
-        # Controls
-        for msg in MESSAGES.get("CONTROLS").split("\n"):
-            text_image = pygame.font.SysFont(FONT_NAME, 16).render(msg, False, TUtils.get_color_tuple(COLORS.get("WHITE")))
-            self.screen.blit(text_image, (text_x_start, text_y_start))
-            text_y_start += 20
-        text_y_start += 10
+        self.render_cache.draw_frame(self.screen, self.get_frame())
 
-        # Score
-        text_image = pygame.font.SysFont(FONT_NAME, 16).render(MESSAGES.get("SCORE").format(self.score, self.lines), False, TUtils.get_color_tuple(COLORS.get("WHITE")))
-        self.screen.blit(text_image, (text_x_start, text_y_start))
-        text_y_start += 20
-
-        # High Score
+    # Copy of what draw shows
+    def get_frame(self):
         high_score = self.score if self.score > self.high_score else self.high_score
         high_score_lines = self.lines if self.lines > self.high_score_lines else self.high_score_lines
-        text_image = pygame.font.SysFont(FONT_NAME, 16).render(MESSAGES.get("HIGH_SCORE").format(high_score, high_score_lines), False, TUtils.get_color_tuple(COLORS.get("WHITE")))
-        self.screen.blit(text_image, (text_x_start, text_y_start))
-        text_y_start += 20
-
-        # Fitness score
-        text_image = pygame.font.SysFont(FONT_NAME, 16).render(MESSAGES.get("FITNESS").format(self.fitness), False, TUtils.get_color_tuple(COLORS.get("WHITE")))
-        self.screen.blit(text_image, (text_x_start, text_y_start))
-        text_y_start += 20
-
-        # Speed
-        speed = SPEED_DEFAULT if not SPEED_SCALE_ENABLED else int(max(50, SPEED_DEFAULT - self.score * SPEED_SCALE))
-        text_image = pygame.font.SysFont(FONT_NAME, 16).render(MESSAGES.get("SPEED").format(speed), False, TUtils.get_color_tuple(COLORS.get("WHITE")))
-        self.screen.blit(text_image, (text_x_start, text_y_start))
-        text_y_start += 20
-
-        # Next tile
-        text_image = pygame.font.SysFont(FONT_NAME, 16).render(MESSAGES.get("NEXT_TILE").format(self.get_next_tile()), False, TUtils.get_color_tuple(COLORS.get("WHITE")))
-        self.screen.blit(text_image, (text_x_start, text_y_start))
-        text_y_start += 20
-
-        self.draw_next_tile((text_x_start, text_y_start))
-        text_y_start += 60
-
-        pygame.display.update()
-
-    # Draw the tetris tiles
-    def draw_tiles(self, matrix, offsets=(0, 0), outline_only=False):
-        for y, row in enumerate(matrix):
-            for x, val in enumerate(row):
-                if val == 0:
-                    continue
-                coord_x = (offsets[0] + x) * self.grid_size
-                coord_y = (offsets[1] + y) * self.grid_size
-                # Draw rectangle
-                if not outline_only:
-                    pygame.draw.rect(self.screen,
-                                     TUtils.get_color_tuple(COLORS.get("TILE_" + TILES[val - 1])),
-                                     (coord_x, coord_y, self.grid_size, self.grid_size))
-                    pygame.draw.rect(self.screen,
-                                     TUtils.get_color_tuple(COLORS.get("BACKGROUND_BLACK")),
-                                     (coord_x, coord_y, self.grid_size, self.grid_size), 1)
-                    # Draw highlight triangle
-                    offset = int(self.grid_size / 10)
-                    pygame.draw.polygon(self.screen, TUtils.get_color_tuple(COLORS.get("TRIANGLE_GRAY")),
-                                        ((coord_x + offset, coord_y + offset),
-                                         (coord_x + 3 * offset, coord_y + offset),
-                                         (coord_x + offset, coord_y + 3 * offset)))
-                else:
-                    # Outline-only for prediction location
-                    pygame.draw.rect(self.screen,
-                                     TUtils.get_color_tuple(COLORS.get("TILE_" + TILES[val - 1])),
-                                     (coord_x + 1, coord_y + 1, self.grid_size - 2, self.grid_size - 2), 1)
-
-    def draw_next_tile(self, offsets):
-        size = int(self.grid_size * 0.75)
-        for y, row in enumerate(TILE_SHAPES.get(self.get_next_tile())):
-            for x, val in enumerate(row):
-                if val == 0:
-                    continue
-                coord_x = offsets[0] + x * size
-                coord_y = offsets[1] + y * size
-                # Draw rectangle
-                pygame.draw.rect(self.screen, TUtils.get_color_tuple(COLORS.get("TILE_" + TILES[val - 1])), (coord_x, coord_y, size, size))
-                pygame.draw.rect(self.screen, TUtils.get_color_tuple(COLORS.get("BACKGROUND_BLACK")), (coord_x, coord_y, size, size), 1)
-                # Draw highlight triangle
-                offset = int(size / 10)
-                pygame.draw.polygon(self.screen, TUtils.get_color_tuple(COLORS.get("TRIANGLE_GRAY")),
-                                    ((coord_x + offset, coord_y + offset),
-                                     (coord_x + 3 * offset, coord_y + offset),
-                                     (coord_x + offset, coord_y + 3 * offset)))
+        return Frame(self.get_display_cells(), self.score, self.lines, high_score, high_score_lines, self.fitness,
+                     self.get_next_tile(), self.active, self.paused)
+
+    # What every grid cell shows: tile value, -value for the prediction outline, 0 when empty
+    def get_display_cells(self):
+        cells = [row[:] for row in self.board]
+        tiles = [(self.tile_y, 1)]
+        # Hypothesized tile
+        if DISPLAY_PREDICTION:
+            tiles.insert(0, (self.get_effective_height(self.tile_shape, (self.tile_x, self.tile_y)), -1))
+        # Current tile on top
+        for offset_y, sign in tiles:
+            for y, row in enumerate(self.tile_shape):
+                for x, val in enumerate(row):
+                    if val != 0 and 0 <= offset_y + y < GRID_ROW_COUNT and 0 <= self.tile_x + x < GRID_COL_COUNT:
+                        cells[offset_y + y][self.tile_x + x] = sign * val
+        return cells
 
     def spawn_tile(self):
         self.tile = self.get_next_tile(pop=True)
@@ -246,7 +182,7 @@ class TetrisGame:
         self.tile_y = 0
 
         self.log("Spawning a new " + self.tile + " tile!", 1)
-        if TUtils.check_collision(self.board, self.tile_shape, (self.tile_x, self.tile_y)):
+        if self.check_collision(self.tile_shape, (self.tile_x, self.tile_y)):
             self.active = False
             self.paused = True
 
@@ -261,7 +197,7 @@ class TetrisGame:
             return
         # Drop the tile
         if instant:
-            destination = TUtils.get_effective_height(self.board, self.tile_shape, (self.tile_x, self.tile_y))
+            destination = self.get_effective_height(self.tile_shape, (self.tile_x, self.tile_y))
             self.score += PER_STEP_SCORE_GAIN * (destination - self.tile_y)
             self.tile_y = destination + 1
         else:
@@ -269,7 +205,7 @@ class TetrisGame:
             self.score += PER_STEP_SCORE_GAIN
 
         # If no collision happen, skip
-        if not TUtils.check_collision(self.board, self.tile_shape, (self.tile_x, self.tile_y)) and not instant:
+        if not self.check_collision(self.tile_shape, (self.tile_x, self.tile_y)) and not instant:
             return
         # Collided! Add tile to board, spawn new tile, and calculate scores
         self.add_tile_to_board()
@@ -283,7 +219,7 @@ class TetrisGame:
         # Clamping
         new_x = max(0, min(new_x, GRID_COL_COUNT - len(self.tile_shape[0])))
         # Cannot "override" blocks AKA cannot move when it is blocked
-        if TUtils.check_collision(self.board, self.tile_shape, (new_x, self.tile_y)):
+        if self.check_collision(self.tile_shape, (new_x, self.tile_y)):
             return
         self.tile_x = new_x
 
@@ -297,7 +233,7 @@ class TetrisGame:
         if self.tile_x + len(new_shape[0]) > GRID_COL_COUNT:
             temp_x = GRID_COL_COUNT - len(new_shape[0])
         # If collide, disallow rotation
-        if TUtils.check_collision(self.board, new_shape, (temp_x, self.tile_y)):
+        if self.check_collision(new_shape, (temp_x, self.tile_y)):
             return False, self.tile_x, self.tile_shape
         if not pseudo:
             self.tile_x = temp_x
@@ -319,7 +255,7 @@ class TetrisGame:
             temp_y = GRID_ROW_COUNT - len(self.tile_shape)
 
         # If collide, disallow swapping
-        if TUtils.check_collision(self.board, new_tile_shape, (temp_x, temp_y)):
+        if self.check_collision(new_tile_shape, (temp_x, temp_y)):
             return False, (self.tile_x, self.tile_y), self.tile_shape
 
         if not pseudo:
@@ -334,21 +270,12 @@ class TetrisGame:
 
     # Calculate score (called after every collision)
     def calculate_scores(self):
-        score_count = 0
-        row = 0
-        while True:
-            if row >= len(self.board):
-                break
-            if 0 in self.board[row]:
-                row += 1
-                continue
-            # Delete the "filled" row
-            del self.board[row]
-            # Insert empty row at top
-            self.board.insert(0, [0] * GRID_COL_COUNT)
-            score_count += 1
+        # Rows filled up by the last tile (see TetrisBoardStats)
+        score_count = len(self.full_rows)
+        if score_count:
+            self.clear_rows(self.full_rows)
         # Calculate fitness score
-        self.fitness = TUtils.get_fitness_score(self.board)
+        self.fitness = self.stats.get_fitness()
         # If cleared nothing, early return
         if score_count == 0:
             return
@@ -361,6 +288,9 @@ class TetrisGame:
         self.score += total_score
         self.lines += score_count
         self.log("Cleared " + str(score_count) + " rows with score " + str(total_score), 3)
+        # Headless games are stepped manually, there is no timer to adjust
+        if self.headless:
+            return
         # Calculate game speed
         pygame.time.set_timer(pygame.USEREVENT + 1, SPEED_DEFAULT if not SPEED_SCALE_ENABLED else int(
             max(50, SPEED_DEFAULT - self.score * SPEED_SCALE)))
@@ -371,8 +301,95 @@ class TetrisGame:
                 if val == 0:
                     continue
                 self.board[cy + self.tile_y - 1][min(cx + self.tile_x, 9)] = val
-
-    def reset(self):
+        if self.bitboard:
+            self.rows = TBits.get_rows_with_tile(self.rows, self.tile_shape, (self.tile_x, self.tile_y - 1))
+        self.full_rows = self.stats.add_tile(self.tile_shape, (self.tile_x, self.tile_y - 1))
+
+    # rows: full rows, top to bottom
+    def clear_rows(self, rows):
+        for y in rows:
+            # Delete the "filled" row, insert empty row at top
+            del self.board[y]
+            self.board.insert(0, [0] * GRID_COL_COUNT)
+            if self.bitboard:
+                del self.rows[y]
+                self.rows.insert(0, 0)
+        self.stats.clear_rows(rows)
+
+    ###############
+    # Board stats #
+    ###############
+    # Kept up to date as tiles lock and lines clear (see TetrisBoardStats)
+    @property
+    def col_heights(self):
+        return self.stats.col_heights
+
+    @property
+    def aggregate_height(self):
+        return self.stats.aggregate_height
+
+    @property
+    def hole_count(self):
+        return self.stats.holes
+
+    @property
+    def bumpiness(self):
+        return self.stats.bumpiness
+
+    @property
+    def row_fill(self):
+        return self.stats.row_fill
+
+    ##################
+    # Board backends #
+    ##################
+    # Row masks of the tile, remembered for the last shape (the same tile is checked over and over)
+    def get_tile_masks(self, tile_shape):
+        if tile_shape is not self.masks_shape:
+            self.masks_shape = tile_shape
+            self.tile_masks = TBits.get_tile_masks(tile_shape)
+        return self.tile_masks
+
+    def check_collision(self, tile_shape, offsets):
+        if self.bitboard:
+            return TBits.check_collision_masks(self.rows, self.get_tile_masks(tile_shape), offsets)
+        return TUtils.check_collision(self.board, tile_shape, offsets)
+
+    def get_effective_height(self, tile_shape, offsets):
+        if self.bitboard:
+            return TBits.get_effective_height_masks(self.rows, self.get_tile_masks(tile_shape), offsets)
+        return TUtils.get_effective_height(self.board, tile_shape, offsets)
+
+    # Flattened board with the current tile (the observation)
+    def get_observation(self):
+        if self.bitboard:
+            return TBits.get_board_with_tile(self.rows, self.tile_shape, (self.tile_x, self.tile_y))
+        return TUtils.get_board_with_tile(self.board, self.tile_shape, (self.tile_x, self.tile_y), True)
+
+    # Same observation, written into out (see TetrisObservation)
+    # next_tile: followed by the one-hot of the next tile
+    def write_observation(self, out, next_tile=False):
+        rows = self.rows if self.bitboard else TBits.from_board(self.board)
+        TObs.write_observation(out, rows, self.tile_shape, (self.tile_x, self.tile_y),
+                               self.get_next_tile() if next_tile else None)
+        return out
+
+    # step() writes its observations into buffer (NumPy array or CPU tensor) and returns it
+    # instead of a new list every time, copy them if you keep them. None goes back to lists.
+    def set_observation_buffer(self, buffer, next_tile=False):
+        self.obs_buffer = buffer
+        self.obs_array = None if buffer is None else TObs.as_array(buffer)
+        self.obs_next_tile = next_tile
+        self.obs_size = TObs.get_obs_size(next_tile)
+
+    # step() publishes its frames to spectator (TetrisSpectator.Spectator), None stops
+    def set_spectator(self, spectator):
+        self.spectator = spectator
+
+    # seed: reseed the tile generation, the episode is then fully determined by its actions
+    def reset(self, seed=None):
+        if seed is not None:
+            self.random.seed(seed)
         self.log("Resetting game...", 2)
         # Calculate high score
         if self.score > self.high_score:
@@ -385,6 +402,32 @@ class TetrisGame:
 
     def reset_board(self):
         self.board = [[0] * GRID_COL_COUNT for _ in range(GRID_ROW_COUNT)]
+        self.rows = [0] * GRID_ROW_COUNT
+        self.stats = TStats.BoardStats()
+        self.full_rows = []
+
+    # Copy of everything step() depends on (not the display, callbacks or high scores)
+    # rng: also copy the tile generation state (most of the cost), only used when the tile bank runs out
+    def snapshot(self, rng=True):
+        return GameSnapshot(tuple(map(tuple, self.board)), tuple(self.rows), self.tile,
+                            tuple(map(tuple, self.tile_shape)), self.tile_x, self.tile_y, tuple(self.tile_bank),
+                            self.score, self.lines, self.fitness, self.active, self.paused,
+                            self.random.getstate() if rng else None, self.stats.snapshot())
+
+    # A snapshot can be restored any number of times
+    def restore(self, snap):
+        self.board = list(map(list, snap.board))
+        self.rows = list(snap.rows)
+        self.stats = TStats.BoardStats.restore(snap.stats)
+        self.full_rows = []
+        self.tile = snap.tile
+        self.tile_shape = list(snap.tile_shape)
+        self.tile_x, self.tile_y = snap.tile_x, snap.tile_y
+        self.tile_bank = list(snap.tile_bank)
+        self.score, self.lines, self.fitness = snap.score, snap.lines, snap.fitness
+        self.active, self.paused = snap.active, snap.paused
+        if snap.rng_state is not None:
+            self.random.setstate(snap.rng_state)
 
     def toggle_pause(self):
         if not self.active:
@@ -399,7 +442,7 @@ class TetrisGame:
 
     def generate_tile_bank(self):
         self.tile_bank = list(TILE_SHAPES.keys())
-        random.shuffle(self.tile_bank)
+        self.random.shuffle(self.tile_bank)
 
     def print_board(self, flattened=False):
         TUtils.print_board(
@@ -422,7 +465,7 @@ class TetrisGame:
     # Action = index of { NOTHING, L, R, 2L, 2R, ROTATE, SWAP, FAST_FALL, INSTA_FALL }
     def step(self, action=0, use_fitness=False):
         # Update UI
-        if HAS_DISPLAY:
+        if not self.headless:
             pygame.event.get()
         # Obtain previous score
         previous_fitness = self.fitness
@@ -441,37 +484,65 @@ class TetrisGame:
             self.drop(instant=(action == 8))
         # Continue by 1 step
         self.drop()
+        if self.spectator is not None:
+            self.spectator.publish(self)
         # >> Returns: board matrix (state), score change (reward), is-game-over (done), next piece (extras)
         measurement = self.score - previous_score
         if use_fitness:
             measurement = self.fitness - previous_fitness
-        board = TUtils.get_board_with_tile(self.board, self.tile_shape, (self.tile_x, self.tile_y), True)
+        if self.obs_buffer is None:
+            board = self.get_observation()
+        else:
+            self.write_observation(self.obs_array, self.obs_next_tile)
+            board = self.obs_buffer
         return board, measurement, not self.active, self.get_next_tile()
 
     # Action = index of { NOTHING, L, R, 2L, 2R, ROTATE, SWAP, FAST_FALL, INSTA_FALL }
+    # Fitness of the board if the tile was dropped right after each action
     def pseudo_step(self):
-        scores = [0] * 9
-        curr_score = TUtils.get_fitness_score(TUtils.get_future_board_with_tile(self.board, self.tile, self.tile_x))
-        # Wait action
-        for action in [0, 7, 8]:
-            scores[action] = curr_score
-        # Move left once
-        scores[1] = curr_score if TUtils.check_collision(self.board, self.tile_shape, (self.tile_x - 1, self.tile_y)) else TUtils.get_fitness_score(TUtils.get_future_board_with_tile(self.board, self.tile, self.tile_x - 1))
-        # Move right once
-        scores[2] = curr_score if TUtils.check_collision(self.board, self.tile_shape, (self.tile_x + 1, self.tile_y)) else TUtils.get_fitness_score(TUtils.get_future_board_with_tile(self.board, self.tile, self.tile_x + 1))
-        # Move left twice
-        scores[3] = scores[1] if TUtils.check_collision(self.board, self.tile_shape, (self.tile_x - 2, self.tile_y)) else TUtils.get_fitness_score(TUtils.get_future_board_with_tile(self.board, self.tile, self.tile_x - 2))
-        # Move right twice
-        scores[4] = scores[2] if TUtils.check_collision(self.board, self.tile_shape, (self.tile_x + 2, self.tile_y)) else TUtils.get_fitness_score(TUtils.get_future_board_with_tile(self.board, self.tile, self.tile_x + 2))
-        # Rotate
+        offsets = (self.tile_x, self.tile_y)
+        # Tile (shape, offsets) after: nothing, left, right, left twice, right twice, rotate, swap
+        # None if the action is blocked
+        candidates = [(self.tile_shape, offsets)]
+        for delta in [-1, 1, -2, 2]:
+            new_offsets = (self.tile_x + delta, self.tile_y)
+            blocked = new_offsets[0] < 0 or self.check_collision(self.tile_shape, new_offsets)
+            candidates.append(None if blocked else (self.tile_shape, new_offsets))
         success, offset_x, tile_shape = self.rotate_tile(pseudo=True)
-        scores[5] = curr_score if not success else TUtils.get_fitness_score(TUtils.get_future_board_with_tile(self.board, tile_shape, offset_x))
+        candidates.append((tile_shape, (offset_x, self.tile_y)) if success else None)
+        success, new_offsets, tile_shape = self.swap_tile(pseudo=True)
+        candidates.append((tile_shape, new_offsets) if success else None)
+
+        if self.board_cache is None:
+            # Fitness after dropping the tile, from the board stats (no board copies)
+            fitness = []
+            for candidate in candidates:
+                if candidate is None:
+                    fitness.append(None)
+                    continue
+                tile_shape, (offset_x, offset_y) = candidate
+                offset_y = self.get_effective_height(tile_shape, (offset_x, offset_y))
+                fitness.append(self.stats.get_future_fitness(tile_shape, (offset_x, offset_y)))
+        else:
+            # Fitness after dropping the tile, the landings and boards seen before come from the cache
+            board = self.board_cache.intern(self.rows if self.bitboard else TBits.from_board(self.board))
+            fitness = [None if candidate is None else self.board_cache.get_future_fitness(board, *candidate)
+                       for candidate in candidates]
+        curr_score, left, right, left2, right2, rotate, swap = fitness
+
+        scores = [curr_score] * 9
+        # Move left/right once
+        scores[1] = curr_score if left is None else left
+        scores[2] = curr_score if right is None else right
+        # Move left/right twice
+        scores[3] = scores[1] if left2 is None else left2
+        scores[4] = scores[2] if right2 is None else right2
+        # Rotate
+        scores[5] = curr_score if rotate is None else rotate
         # Swap
-        success, offsets, tile_shape = self.swap_tile(pseudo=True)
-        scores[6] = curr_score if not success else TUtils.get_fitness_score(TUtils.get_future_board_with_tile(self.board, tile_shape, offsets[0]))
+        scores[6] = curr_score if swap is None else swap
         return scores
 
-
 if __name__ == "__main__":
     print("Hello world!")
     # User testing (AKA play game)
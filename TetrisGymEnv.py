@@ -0,0 +1,363 @@
+# Gym style environments over the TetrisGame.py
+# Keep the coupling to a minimum
+#
+# TetrisEnv                single game (gymnasium.Env when gymnasium is installed)
+# SyncVectorTetrisEnv      N games stepped one after the other in this process
+# AsyncVectorTetrisEnv     N games split over worker processes, stepped in parallel
+#
+# Observations: {"board": (20, 10) uint8, "next_tile": index of the next tile in TILES}
+# (batched on the first axis for the vector environments). The board is the same
+# as TetrisGame.get_observation (board cells are 1, the current tile keeps its value).
+# Actions: index of ACTIONS. Rewards: score change (fitness change with use_fitness).
+#
+# The vector environments reset finished games right away (same step): the
+# returned observation is the first one of the new game, the last observation of
+# the finished game is in infos["final_board"] / infos["final_next_tile"] where
+# infos["_final_observation"] is True. infos also holds "score", "lines" and "fitness".
+#
+# The async workers write straight into shared memory, step_async / step_wait
+# let the agent run inference (e.g. on another batch) while the games step.
+
+import os
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from AI_Club_Tetris import TetrisGame as TGame
+from AI_Club_Tetris.TetrisSettings import *
+
+try:
+    import gymnasium as gym
+    from gymnasium import spaces
+except ImportError:  # Works without gymnasium, with the minimal spaces below
+    gym = None
+    spaces = None
+
+BOARD_SHAPE = (GRID_ROW_COUNT, GRID_COL_COUNT)
+# Largest observation value (a tile keeps its board value)
+MAX_CELL_VALUE = len(TILES)
+
+
+##########
+# Spaces #
+##########
+# Stand-ins for the gymnasium spaces (shape, dtype, sample and contains only)
+class Box:
+    def __init__(self, low, high, shape, dtype):
+        self.low, self.high, self.shape, self.dtype = low, high, shape, np.dtype(dtype)
+
+    def sample(self, rng=None):
+        rng = np.random.default_rng() if rng is None else rng
+        return rng.integers(self.low, self.high + 1, self.shape).astype(self.dtype)
+
+    def contains(self, x):
+        x = np.asarray(x)
+        return x.shape == self.shape and bool(((x >= self.low) & (x <= self.high)).all())
+
+
+class Discrete(Box):
+    def __init__(self, n):
+        super().__init__(0, n - 1, (), np.int64)
+        self.n = n
+
+
+class Dict:
+    def __init__(self, spaces):
+        self.spaces = spaces
+
+    def __getitem__(self, key):
+        return self.spaces[key]
+
+    def sample(self, rng=None):
+        return {key: space.sample(rng) for key, space in self.spaces.items()}
+
+    def contains(self, x):
+        return all(space.contains(x[key]) for key, space in self.spaces.items())
+
+
+# count: batch size, None for a single game
+def get_observation_space(count=None):
+    if spaces is not None:
+        space = spaces.Dict({"board": spaces.Box(0, MAX_CELL_VALUE, BOARD_SHAPE, np.uint8),
+                             "next_tile": spaces.Discrete(len(TILES))})
+        return space if count is None else gym.vector.utils.batch_space(space, count)
+    if count is None:
+        return Dict({"board": Box(0, MAX_CELL_VALUE, BOARD_SHAPE, np.uint8), "next_tile": Discrete(len(TILES))})
+    return Dict({"board": Box(0, MAX_CELL_VALUE, (count,) + BOARD_SHAPE, np.uint8),
+                 "next_tile": Box(0, len(TILES) - 1, (count,), np.int64)})
+
+
+def get_action_space(count=None):
+    if spaces is not None:
+        space = spaces.Discrete(len(ACTIONS))
+        return space if count is None else gym.vector.utils.batch_space(space, count)
+    return Discrete(len(ACTIONS)) if count is None else Box(0, len(ACTIONS) - 1, (count,), np.int64)
+
+
+##############
+# Single env #
+##############
+class TetrisEnv(gym.Env if gym is not None else object):
+    metadata = {"render_modes": []}
+
+    # max_steps: truncate the episodes after this many steps (None = never)
+    def __init__(self, use_fitness=False, bitboard=USE_BITBOARD, max_steps=None, seed=None):
+        self.use_fitness = use_fitness
+        self.max_steps = max_steps
+        self.game = TGame.TetrisGame(headless=True, bitboard=bitboard, seed=seed)
+        self.observation_space = get_observation_space()
+        self.action_space = get_action_space()
+        self.steps = 0
+
+    def get_obs(self):
+        board = np.empty(BOARD_SHAPE, dtype=np.uint8)
+        self.game.write_observation(board.reshape(-1))
+        return {"board": board, "next_tile": TILES.index(self.game.get_next_tile())}
+
+    def get_info(self):
+        return {"score": self.game.score, "lines": self.game.lines, "fitness": self.game.fitness}
+
+    def reset(self, seed=None, options=None):
+        self.game.reset(seed)
+        self.steps = 0
+        return self.get_obs(), self.get_info()
+
+    # >> Returns: obs, reward, terminated, truncated, info
+    def step(self, action):
+        _, reward, done, _ = self.game.step(int(action), self.use_fitness)
+        self.steps += 1
+        truncated = not done and self.max_steps is not None and self.steps >= self.max_steps
+        return self.get_obs(), reward, done, truncated, self.get_info()
+
+    def close(self):
+        pass
+
+
+###############
+# Vector envs #
+###############
+# Arrays shared by all the games of a vector env: (name, dtype, shape of one entry)
+ENV_LAYOUT = [
+    ("boards", np.uint8, BOARD_SHAPE),
+    ("next_tiles", np.int64, ()),
+    ("actions", np.int64, ()),
+    ("rewards", np.float64, ()),
+    ("terminated", np.bool_, ()),
+    ("truncated", np.bool_, ()),
+    ("scores", np.float64, ()),
+    ("lines", np.int64, ()),
+    ("fitness", np.float64, ()),
+    ("final_boards", np.uint8, BOARD_SHAPE),
+    ("final_next_tiles", np.int64, ()),
+]
+
+
+def get_env_nbytes(count):
+    return sum(np.dtype(dtype).itemsize * int(np.prod(shape)) * count for _, dtype, shape in ENV_LAYOUT)
+
+
+def get_env_views(buffer, count):
+    views = {}
+    offset = 0
+    for name, dtype, shape in ENV_LAYOUT:
+        views[name] = np.ndarray((count,) + shape, dtype=dtype, buffer=buffer, offset=offset)
+        offset += views[name].nbytes
+    return views
+
+
+# The games of slots [start, end) of the views
+class GameSlots:
+    def __init__(self, views, start, end, use_fitness, bitboard, max_steps):
+        self.views = views
+        self.start = start
+        self.end = end
+        self.use_fitness = use_fitness
+        self.max_steps = max_steps
+        self.games = [TGame.TetrisGame(headless=True, bitboard=bitboard) for _ in range(start, end)]
+        self.steps = [0] * (end - start)
+
+    def write_obs(self, i, boards, next_tiles):
+        game = self.games[i - self.start]
+        game.write_observation(boards[i].reshape(-1))
+        next_tiles[i] = TILES.index(game.get_next_tile())
+
+    def write_info(self, i):
+        game = self.games[i - self.start]
+        self.views["scores"][i] = game.score
+        self.views["lines"][i] = game.lines
+        self.views["fitness"][i] = game.fitness
+
+    # seeds: one per slot (None entries keep the current random stream)
+    def reset(self, seeds):
+        views = self.views
+        for i, game in enumerate(self.games, self.start):
+            game.reset(seeds[i - self.start])
+            self.steps[i - self.start] = 0
+            self.write_obs(i, views["boards"], views["next_tiles"])
+            self.write_info(i)
+
+    # Steps every slot with views["actions"]
+    def step(self):
+        views = self.views
+        for i, game in enumerate(self.games, self.start):
+            _, reward, done, _ = game.step(int(views["actions"][i]), self.use_fitness)
+            self.steps[i - self.start] += 1
+            truncated = not done and self.max_steps is not None and self.steps[i - self.start] >= self.max_steps
+            views["rewards"][i] = reward
+            views["terminated"][i] = done
+            views["truncated"][i] = truncated
+            self.write_info(i)
+            if done or truncated:
+                self.write_obs(i, views["final_boards"], views["final_next_tiles"])
+                game.reset()
+                self.steps[i - self.start] = 0
+            self.write_obs(i, views["boards"], views["next_tiles"])
+
+
+class VectorTetrisEnv:
+    # count games, numbered 0 to count - 1
+    def __init__(self, count):
+        self.num_envs = count
+        self.single_observation_space = get_observation_space()
+        self.single_action_space = get_action_space()
+        self.observation_space = get_observation_space(count)
+        self.action_space = get_action_space(count)
+        self.copy = True
+        self.views = None
+
+    # seed: game i gets seed + i
+    def get_seeds(self, seed):
+        return [None if seed is None else seed + i for i in range(self.num_envs)]
+
+    def get_obs(self):
+        views = self.views
+        if self.copy:
+            return {"board": views["boards"].copy(), "next_tile": views["next_tiles"].copy()}
+        return {"board": views["boards"], "next_tile": views["next_tiles"]}
+
+    def get_infos(self):
+        views = self.views
+        infos = {"score": views["scores"].copy(), "lines": views["lines"].copy(), "fitness": views["fitness"].copy()}
+        final = views["terminated"] | views["truncated"]
+        if final.any():
+            infos["_final_observation"] = final
+            infos["final_board"] = views["final_boards"].copy()
+            infos["final_next_tile"] = views["final_next_tiles"].copy()
+        return infos
+
+    # >> Returns: obs, rewards, terminated, truncated, infos
+    def get_step_result(self):
+        views = self.views
+        return (self.get_obs(), views["rewards"].copy(), views["terminated"].copy(), views["truncated"].copy(),
+                self.get_infos())
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+
+class SyncVectorTetrisEnv(VectorTetrisEnv):
+    # copy: return copies of the observations (they are overwritten by the next step otherwise)
+    def __init__(self, count, use_fitness=False, bitboard=USE_BITBOARD, max_steps=None, copy=True):
+        super().__init__(count)
+        self.copy = copy
+        self.views = {name: np.zeros((count,) + shape, dtype=dtype) for name, dtype, shape in ENV_LAYOUT}
+        self.slots = GameSlots(self.views, 0, count, use_fitness, bitboard, max_steps)
+
+    def reset(self, seed=None, options=None):
+        self.views["terminated"][:] = False
+        self.views["truncated"][:] = False
+        self.slots.reset(self.get_seeds(seed))
+        return self.get_obs(), self.get_infos()
+
+    def step_async(self, actions):
+        self.views["actions"][:] = actions
+
+    def step_wait(self):
+        self.slots.step()
+        return self.get_step_result()
+
+    def close(self):
+        pass
+
+
+def env_worker(shm_name, count, start, end, use_fitness, bitboard, max_steps, conn):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    views = get_env_views(shm.buf, count)
+    slots = GameSlots(views, start, end, use_fitness, bitboard, max_steps)
+    while True:
+        command, arg = conn.recv()
+        if command == "step":
+            slots.step()
+        elif command == "reset":
+            slots.reset(arg)
+        elif command == "close":
+            break
+        conn.send(True)
+    del views, slots
+    shm.close()
+
+
+class AsyncVectorTetrisEnv(VectorTetrisEnv):
+    # worker_count: processes the games are split over (default: one per core, at most one per game)
+    def __init__(self, count, worker_count=None, use_fitness=False, bitboard=USE_BITBOARD, max_steps=None,
+                 copy=True):
+        super().__init__(count)
+        self.copy = copy
+        self.worker_count = min(worker_count or os.cpu_count(), count)
+        self.shm = shared_memory.SharedMemory(create=True, size=get_env_nbytes(count))
+        self.views = get_env_views(self.shm.buf, count)
+        self.views["terminated"][:] = False
+        self.views["truncated"][:] = False
+        # CUDA cannot be forked, always spawn fresh interpreters
+        context = mp.get_context("spawn")
+        self.bounds = np.linspace(0, count, self.worker_count + 1).astype(int)
+        self.conns = []
+        self.processes = []
+        for start, end in zip(self.bounds[:-1], self.bounds[1:]):
+            conn, worker_conn = context.Pipe()
+            process = context.Process(target=env_worker, daemon=True,
+                                      args=(self.shm.name, count, int(start), int(end), use_fitness, bitboard,
+                                            max_steps, worker_conn))
+            process.start()
+            self.conns.append(conn)
+            self.processes.append(process)
+        self.waiting = False
+
+    def send(self, command, args=None):
+        for i, conn in enumerate(self.conns):
+            conn.send((command, None if args is None else args[i]))
+
+    def wait(self):
+        for conn in self.conns:
+            conn.recv()
+
+    def reset(self, seed=None, options=None):
+        if self.waiting:
+            self.step_wait()
+        seeds = self.get_seeds(seed)
+        self.views["terminated"][:] = False
+        self.views["truncated"][:] = False
+        self.send("reset", [seeds[start:end] for start, end in zip(self.bounds[:-1], self.bounds[1:])])
+        self.wait()
+        return self.get_obs(), self.get_infos()
+
+    # Starts stepping the games, the results are collected by step_wait
+    def step_async(self, actions):
+        self.views["actions"][:] = actions
+        self.send("step")
+        self.waiting = True
+
+    def step_wait(self):
+        self.wait()
+        self.waiting = False
+        return self.get_step_result()
+
+    def close(self):
+        if self.waiting:
+            self.wait()
+        self.send("close")
+        for process in self.processes:
+            process.join()
+        self.views = None
+        self.shm.close()
+        self.shm.unlink()
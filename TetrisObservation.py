@@ -0,0 +1,66 @@
+# Observations written into preallocated buffers for the TetrisGame.py
+# Keep the coupling to a minimum
+#
+# Same values as TetrisUtils.get_board_with_tile(..., flattened=True), flattened:
+# board cells are 1 and tile cells keep their value. Optionally followed by a
+# one-hot of the next tile (NEXT_TILE_SIZE channels, in TILES order).
+#
+# The buffer can be any contiguous NumPy array or CPU tensor with room for the
+# observation, e.g. one slot of a (N, obs size) batch.
+
+import numpy as np
+from AI_Club_Tetris import TetrisBitboard as TBits
+from AI_Club_Tetris.TetrisSettings import *
+
+OBS_SIZE = GRID_ROW_COUNT * GRID_COL_COUNT
+NEXT_TILE_SIZE = len(TILES)
+
+# Row bitmask -> its cells (0/1), per dtype of the buffers
+ROW_CELLS = {np.dtype(np.uint8): ((np.arange(TBits.FULL_ROW + 1)[:, None] >> np.arange(GRID_COL_COUNT)) & 1)
+             .astype(np.uint8)}
+
+# Tile shape (as tuples) -> [(cy, cx, value), ...] of its filled cells
+TILE_CELLS = {}
+
+
+def get_obs_size(next_tile=False):
+    return OBS_SIZE + (NEXT_TILE_SIZE if next_tile else 0)
+
+
+def get_row_cells(dtype):
+    table = ROW_CELLS.get(dtype)
+    if table is None:
+        table = ROW_CELLS[dtype] = ROW_CELLS[np.dtype(np.uint8)].astype(dtype)
+    return table
+
+
+def get_tile_cells(tile_shape):
+    key = TBits.get_tile_key(tile_shape)
+    cells = TILE_CELLS.get(key)
+    if cells is None:
+        cells = TILE_CELLS[key] = [(cy, cx, val) for cy, row in enumerate(key) for cx, val in enumerate(row) if val]
+    return cells
+
+
+# NumPy view of a buffer (CPU tensors share their memory with it)
+def as_array(buffer):
+    if isinstance(buffer, np.ndarray):
+        return buffer
+    return buffer.numpy()
+
+
+# rows: bitboard (see TetrisBitboard), next_tile: name of the next tile or None
+def write_observation(out, rows, tile_shape, offsets, next_tile=None):
+    out = as_array(out)
+    if not out.flags.c_contiguous:
+        raise ValueError("observation buffers must be contiguous")
+    grid = out[:OBS_SIZE].reshape(GRID_ROW_COUNT, GRID_COL_COUNT)
+    np.take(get_row_cells(out.dtype), rows, axis=0, out=grid)
+    offset_x, offset_y = offsets
+    for cy, cx, val in get_tile_cells(tile_shape):
+        grid[cy + offset_y, cx + offset_x] = val
+    if next_tile is not None:
+        one_hot = out[OBS_SIZE:OBS_SIZE + NEXT_TILE_SIZE]
+        one_hot.fill(0)
+        one_hot[TILES.index(next_tile)] = 1
+    return out
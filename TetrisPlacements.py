@@ -0,0 +1,205 @@
+# Placement enumeration for the TetrisGame.py
+# Keep the coupling to a minimum
+#
+# Finds every distinct place a tile can lock into, by searching over the
+# actions TetrisGame.step supports (including the automatic drop after every
+# action), so only reachable placements are returned.
+#
+# Every step moves the tile down by at least one row, so the search goes row
+# by row: for every row and state, the reachable x positions are a bitmask
+# and all the moves of a step are a handful of shifts on it.
+# A state is the active tile and its rotation. With a next tile, SWAP is one
+# of the moves: at any row, the other tile comes in unrotated at the same
+# x / y if it fits there (TetrisGame.swap_tile), swapping again brings the
+# first tile back, unrotated as well.
+# Fast/insta falls reach nothing a chain of NOTHING would not, they are only
+# used when turning a placement back into actions.
+
+from AI_Club_Tetris import TetrisBitboard as TBits
+from AI_Club_Tetris.TetrisSettings import *
+
+ACTION_NOTHING = ACTIONS.index("NOTHING")
+ACTION_L = ACTIONS.index("L")
+ACTION_R = ACTIONS.index("R")
+ACTION_2L = ACTIONS.index("2L")
+ACTION_2R = ACTIONS.index("2R")
+ACTION_ROTATE = ACTIONS.index("ROTATE")
+ACTION_SWAP = ACTIONS.index("SWAP")
+ACTION_INSTA_FALL = ACTIONS.index("INSTA_FALL")
+
+SPAWN_KEYS = {TBits.get_tile_key(shape) for shape in TILE_SHAPES.values()}
+
+
+# free[y] = bitmask of the x positions where the tile fits at row y
+def get_free_masks(rows, masks, width):
+    height = len(masks)
+    cells = [(cy, bit) for cy, mask in enumerate(masks) for bit in range(GRID_COL_COUNT) if (mask >> bit) & 1]
+    valid = (1 << (GRID_COL_COUNT - width + 1)) - 1
+    # Two extra rows below the board (always colliding)
+    free = [0] * (GRID_ROW_COUNT + 2)
+    for y in range(GRID_ROW_COUNT - height + 1):
+        blocked = 0
+        for cy, bit in cells:
+            blocked |= rows[y + cy] >> bit
+        free[y] = valid & ~blocked
+    return free
+
+
+# Rotations that bring tile_shape back to its spawn shape (the one of TILE_SHAPES)
+def get_spawn_rotation(tile_shape):
+    shape = tile_shape
+    for r in range(4):
+        if TBits.get_tile_key(shape) in SPAWN_KEYS:
+            return r
+        shape = list(zip(*reversed(shape)))
+    return 0
+
+
+class PlacementSearch:
+    # next_shape: the next tile (unrotated) that SWAP brings in, None to never swap
+    def __init__(self, rows, tile_shape, offsets, next_shape=None):
+        self.rows = rows
+        # State s = tile * 4 + rotation: tile 0 is tile_shape, tile 1 the next tile, rotated
+        # rotation times (TetrisUtils.get_rotated_tile)
+        shapes = [tile_shape] if next_shape is None else [tile_shape, next_shape]
+        self.masks = []
+        self.max_x = []
+        self.free = []
+        cache = {}
+        for shape in shapes:
+            for _ in range(4):
+                key = TBits.get_tile_key(shape)
+                masks = TBits.get_tile_masks(shape)
+                if key not in cache:
+                    cache[key] = get_free_masks(rows, masks, len(shape[0]))
+                self.masks.append(masks)
+                self.max_x.append(GRID_COL_COUNT - len(shape[0]))
+                self.free.append(cache[key])
+                shape = list(zip(*reversed(shape)))
+        # State a SWAP leads to, from tile 0 / from tile 1
+        self.swap_states = [4, get_spawn_rotation(tile_shape)] if next_shape is not None else None
+
+        # reachable[s][y]: x positions the tile can be at when a step starts
+        # placed[s][y]: x positions the tile can be at after the action of that step
+        self.reachable = [[0] * (GRID_ROW_COUNT + 2) for _ in self.masks]
+        self.placed = [[0] * (GRID_ROW_COUNT + 2) for _ in self.masks]
+        self.placements = []
+
+        x0, y0 = offsets
+        self.start_y = y0
+        if x0 < 0 or x0 > self.max_x[0] or not (self.free[0][y0] >> x0) & 1:
+            return
+        self.reachable[0][y0] = 1 << x0
+        self.search(y0)
+
+    def search(self, y0):
+        reachable, placed, free, max_x = self.reachable, self.placed, self.free, self.max_x
+        states = len(self.masks)
+        locks = set()
+        for y in range(y0, GRID_ROW_COUNT):
+            for s in range(states):
+                x_mask = reachable[s][y]
+                if not x_mask:
+                    continue
+                fits = free[s][y]
+                # NOTHING, L, 2L, R, 2R (moves are clamped: a 2L / 2R into the wall ends
+                # at x = 0 / max_x, which L / R reach as well)
+                placed[s][y] |= x_mask | (((x_mask >> 1) | (x_mask >> 2) | (x_mask << 1) | (x_mask << 2)) & fits)
+                # ROTATE (x is pulled back inside the board)
+                new_s = s - s % 4 + (s + 1) % 4
+                new_max = max_x[new_s]
+                inside = (1 << (new_max + 1)) - 1
+                rotated = x_mask & inside & free[new_s][y]
+                if x_mask & ~inside and (free[new_s][y] >> new_max) & 1:
+                    rotated |= 1 << new_max
+                placed[new_s][y] |= rotated
+                # SWAP (same x / y, the other tile has to fit there)
+                if self.swap_states is not None:
+                    new_s = self.swap_states[s // 4]
+                    placed[new_s][y] |= x_mask & free[new_s][y]
+            # Continue by 1 step, the tiles that cannot fall lock here
+            for s in range(states):
+                x_mask = placed[s][y]
+                if not x_mask:
+                    continue
+                below = free[s][y + 1]
+                reachable[s][y + 1] = x_mask & below
+                locked = x_mask & ~below
+                while locked:
+                    low = locked & -locked
+                    locked ^= low
+                    x = low.bit_length() - 1
+                    # Symmetric rotations fill the same cells (the tile matters, it decides the next one)
+                    key = (s // 4, y, tuple(mask << x for mask in self.masks[s]))
+                    if key not in locks:
+                        locks.add(key)
+                        locked_rows = self.rows[:]
+                        for cy, mask in enumerate(key[2]):
+                            locked_rows[y + cy] |= mask
+                        self.placements.append((locked_rows, (s // 4, s % 4, x, y)))
+
+    # Action (and state / position) that puts the tile at x of placed[s][y]
+    def find_source(self, s, x, y):
+        bit = 1 << x
+        x_mask = self.reachable[s][y]
+        if x_mask & bit:
+            return s, x, ACTION_NOTHING
+        if x_mask & (bit << 1):
+            return s, x + 1, ACTION_L
+        if x_mask & (bit >> 1):
+            return s, x - 1, ACTION_R
+        if x_mask & (bit << 2):
+            return s, x + 2, ACTION_2L
+        if x_mask & (bit >> 2):
+            return s, x - 2, ACTION_2R
+        previous_s = s - s % 4 + (s - 1) % 4
+        x_mask = self.reachable[previous_s][y]
+        if x < self.max_x[s]:
+            if x_mask & bit:
+                return previous_s, x, ACTION_ROTATE
+        elif x_mask >> x:
+            # Pulled back from x or further right
+            x_mask >>= x
+            return previous_s, x + (x_mask & -x_mask).bit_length() - 1, ACTION_ROTATE
+        # Swapped in over any rotation of the other tile
+        if self.swap_states is not None and self.swap_states[1 - s // 4] == s:
+            other = 4 - s // 4 * 4
+            for source_s in range(other, other + 4):
+                if self.reachable[source_s][y] & bit:
+                    return source_s, x, ACTION_SWAP
+        raise ValueError(f"no action puts the tile at {(s, x, y)}")
+
+    # Actions that bring the tile to x of reachable[s][y]
+    def get_path(self, s, x, y):
+        actions = []
+        while y > self.start_y:
+            y -= 1
+            s, x, action = self.find_source(s, x, y)
+            actions.append(action)
+        return actions[::-1]
+
+    # placement: (tile (0: current, 1: next swapped in), rotation count, x, y)
+    # Action = index of { NOTHING, L, R, 2L, 2R, ROTATE, SWAP, FAST_FALL, INSTA_FALL }
+    def get_actions(self, placement):
+        tile, r, x, y = placement
+        s = tile * 4 + r
+        bit = 1 << x
+        # Insta-fall from the highest row the tile can fall straight down from
+        highest = None
+        from_y = y
+        while from_y >= self.start_y and self.free[s][from_y] & bit:
+            if self.reachable[s][from_y] & bit:
+                highest = from_y
+            from_y -= 1
+        if highest is not None:
+            return self.get_path(s, x, highest) + [ACTION_INSTA_FALL]
+        # Locked by the drop right after the action
+        source_s, source_x, action = self.find_source(s, x, y)
+        return self.get_path(source_s, source_x, y) + [action]
+
+
+# next_shape: also the placements of the next tile swapped in (at any point)
+# >> Returns: [(rows with the tile locked in, actions, (tile, rotation count, x, y)), ...]
+def get_placements(rows, tile_shape, offsets, next_shape=None):
+    search = PlacementSearch(rows, tile_shape, offsets, next_shape)
+    return [(locked_rows, search.get_actions(placement), placement) for locked_rows, placement in search.placements]
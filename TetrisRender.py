@@ -0,0 +1,229 @@
+# Render cache for the TetrisGame.py
+# Keep the coupling to a minimum
+#
+# Everything TetrisGame.draw used to rebuild every frame is built once:
+# fonts, colors, the static layer (background, striped columns and the
+# controls), one pre-shaded sprite per tile value (fill, outline and highlight
+# triangle, as in the old draw_tiles) and the rendered text lines, which are
+# only rendered again when their text changes.
+#
+# It also remembers what is on screen (every grid cell, text line and the next
+# tile) so that a frame only redraws what changed and returns the dirty rects
+# for pygame.display.update. invalidate() forces a full frame.
+#
+# Only imported by non-headless games (pygame must be initialized).
+
+import pygame
+from AI_Club_Tetris import TetrisUtils as TUtils
+from AI_Club_Tetris.TetrisSettings import *
+
+
+class RenderCache:
+    def __init__(self, grid_size):
+        self.grid_size = grid_size
+        self.colors = {name: TUtils.get_color_tuple(color) for name, color in COLORS.items()}
+        self.fonts = {}
+        # Text line slot -> (text, surface)
+        self.lines = {}
+        # Tile value -> sprite
+        self.cells = {}
+        self.outlines = {}
+        self.next_cells = {}
+        self.static_layer = None
+        # On screen: what every grid cell shows (None: nothing drawn yet), slot -> (key, rect)
+        self.frame = None
+        self.drawn = {}
+
+    def get_font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            font = self.fonts[size] = pygame.font.SysFont(FONT_NAME, size)
+        return font
+
+    def render_text(self, message, size):
+        return self.get_font(size).render(message, False, self.colors["WHITE"])
+
+    # Same surface as long as the message of the slot does not change
+    def get_line(self, slot, message, size=16):
+        line = self.lines.get(slot)
+        if line is None or line[0] != message:
+            line = self.lines[slot] = (message, self.render_text(message, size))
+        return line[1]
+
+    ###########
+    # Sprites #
+    ###########
+    # Filled cell with its border and highlight triangle
+    def create_cell(self, val, size):
+        surface = pygame.Surface((size, size))
+        pygame.draw.rect(surface, self.colors["TILE_" + TILES[val - 1]], (0, 0, size, size))
+        pygame.draw.rect(surface, self.colors["BACKGROUND_BLACK"], (0, 0, size, size), 1)
+        offset = int(size / 10)
+        pygame.draw.polygon(surface, self.colors["TRIANGLE_GRAY"],
+                            ((offset, offset), (3 * offset, offset), (offset, 3 * offset)))
+        return surface
+
+    def get_cell(self, val):
+        surface = self.cells.get(val)
+        if surface is None:
+            surface = self.cells[val] = self.create_cell(val, self.grid_size)
+        return surface
+
+    # Outline of the predicted location (transparent inside)
+    def get_outline(self, val):
+        surface = self.outlines.get(val)
+        if surface is None:
+            size = self.grid_size
+            surface = self.outlines[val] = pygame.Surface((size, size), pygame.SRCALPHA)
+            pygame.draw.rect(surface, self.colors["TILE_" + TILES[val - 1]], (1, 1, size - 2, size - 2), 1)
+        return surface
+
+    def get_next_cell(self, val):
+        surface = self.next_cells.get(val)
+        if surface is None:
+            surface = self.next_cells[val] = self.create_cell(val, int(self.grid_size * 0.75))
+        return surface
+
+    ##########
+    # Layers #
+    ##########
+    # Background, striped board columns and the controls (text_x: left of the message board)
+    def get_static_layer(self, text_x):
+        if self.static_layer is None:
+            layer = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+            layer.fill(self.colors["BACKGROUND_BLACK"])
+            for a in range(GRID_COL_COUNT):
+                color = self.colors["BACKGROUND_DARK" if a % 2 == 0 else "BACKGROUND_LIGHT"]
+                pygame.draw.rect(layer, color, (a * self.grid_size, 0, self.grid_size, SCREEN_HEIGHT))
+            text_y = 60
+            for msg in MESSAGES.get("CONTROLS").split("\n"):
+                layer.blit(self.render_text(msg, 16), (text_x, text_y))
+                text_y += 20
+            self.static_layer = layer
+        return self.static_layer
+
+    ####################
+    # Dirty rectangles #
+    ####################
+    def invalidate(self):
+        self.frame = None
+
+    # Draws the static layer if nothing is on screen yet
+    # >> Returns: True when it did (update the whole display)
+    def begin_frame(self, screen, text_x):
+        if self.frame is not None:
+            return False
+        screen.blit(self.get_static_layer(text_x), (0, 0))
+        self.frame = [[0] * GRID_COL_COUNT for _ in range(GRID_ROW_COUNT)]
+        self.drawn = {}
+        return True
+
+    # cells: what every grid cell shows (tile value, -value for the prediction outline, 0 when empty)
+    # >> Returns: rects of the cells that changed since the last frame
+    def draw_cells(self, screen, cells):
+        size = self.grid_size
+        frame = self.frame
+        rects = []
+        for y, row in enumerate(cells):
+            last_row = frame[y]
+            if last_row == row:
+                continue
+            for x, val in enumerate(row):
+                if last_row[x] == val:
+                    continue
+                rect = pygame.Rect(x * size, y * size, size, size)
+                screen.blit(self.static_layer, rect, rect)
+                if val > 0:
+                    screen.blit(self.get_cell(val), rect)
+                elif val < 0:
+                    screen.blit(self.get_outline(-val), rect)
+                rects.append(rect)
+            frame[y] = row
+        return rects
+
+    # >> Returns: the rect to update, None if the line did not change
+    def draw_line(self, screen, slot, message, pos, size=16):
+        drawn = self.drawn.get(slot)
+        if drawn is not None and drawn[0] == message:
+            return None
+        surface = self.get_line(slot, message, size)
+        rect = surface.get_rect(topleft=pos)
+        # Cover the previous text as well (it may have been longer)
+        dirty = rect if drawn is None else rect.union(drawn[1])
+        screen.blit(self.static_layer, dirty, dirty)
+        screen.blit(surface, rect)
+        self.drawn[slot] = (message, rect)
+        return dirty
+
+    # >> Returns: the rect to update, None if the next tile did not change
+    def draw_next_tile(self, screen, tile, pos):
+        drawn = self.drawn.get("NEXT_TILE_SHAPE")
+        if drawn is not None and drawn[0] == tile:
+            return None
+        size = int(self.grid_size * 0.75)
+        # Room for the largest tile
+        area = pygame.Rect(pos, (size * max(len(shape[0]) for shape in TILE_SHAPES.values()),
+                                 size * max(len(shape) for shape in TILE_SHAPES.values())))
+        screen.blit(self.static_layer, area, area)
+        for y, row in enumerate(TILE_SHAPES.get(tile)):
+            for x, val in enumerate(row):
+                if val == 0:
+                    continue
+                screen.blit(self.get_next_cell(val), (pos[0] + x * size, pos[1] + y * size))
+        self.drawn["NEXT_TILE_SHAPE"] = (tile, area)
+        return area
+
+    # Draws a TetrisGame.Frame, updates the display (update=False for offscreen surfaces)
+    def draw_frame(self, screen, frame, update=True):
+        # Coordinates calculations
+        margin = 20  # 20 pixels margin
+        text_x_start = GRID_COL_COUNT * self.grid_size + margin
+        text_y_start = margin
+
+        # Background, layered board background and controls
+        full = self.begin_frame(screen, text_x_start)
+
+        ################
+        # Tetris Board #
+        ################
+        dirty = self.draw_cells(screen, frame.cells)
+
+        #################
+        # Message Board #
+        #################
+        # Title
+        message = MESSAGES.get("TITLE")
+        if not frame.active:
+            message = "Game Over"
+        elif frame.paused:
+            message = "= PAUSED ="
+        dirty.append(self.draw_line(screen, "TITLE", message, (text_x_start, text_y_start), 32))
+        text_y_start = 60
+
+        # Controls (on the static layer)
+        text_y_start += 20 * len(MESSAGES.get("CONTROLS").split("\n"))
+        text_y_start += 10
+
+        # Score
+        speed = SPEED_DEFAULT if not SPEED_SCALE_ENABLED else int(max(50, SPEED_DEFAULT - frame.score * SPEED_SCALE))
+        lines = [
+            ("SCORE", MESSAGES.get("SCORE").format(frame.score, frame.lines)),
+            ("HIGH_SCORE", MESSAGES.get("HIGH_SCORE").format(frame.high_score, frame.high_score_lines)),
+            ("FITNESS", MESSAGES.get("FITNESS").format(frame.fitness)),
+            ("SPEED", MESSAGES.get("SPEED").format(speed)),
+            ("NEXT_TILE", MESSAGES.get("NEXT_TILE").format(frame.next_tile)),
+        ]
+        for slot, message in lines:
+            dirty.append(self.draw_line(screen, slot, message, (text_x_start, text_y_start)))
+            text_y_start += 20
+
+        dirty.append(self.draw_next_tile(screen, frame.next_tile, (text_x_start, text_y_start)))
+
+        if not update:
+            return
+        if full:
+            pygame.display.update()
+        else:
+            dirty = [rect for rect in dirty if rect is not None]
+            if dirty:
+                pygame.display.update(dirty)
@@ -0,0 +1,176 @@
+# Multi-piece lookahead for the TetrisGame.py
+# Keep the coupling to a minimum
+#
+# Beam search over the placements (see TetrisPlacements) of the current tile and
+# the known tiles of the tile bank. Every ply either places the current tile, or
+# swaps the next one in and places it (the current tile then stays for the next ply).
+# Boards are scored with Lee's fitness (see TetrisFitness), the lines cleared on
+# the previous plies are added so boards of the same depth stay comparable.
+#
+# Transposition table: the placements of a tile on a board are searched and
+# scored once per (rows, tile, next tile) key, whatever order of tiles led
+# to the board. It is kept between moves, the plies of the previous move are
+# mostly the plies of the next one, and evicts the least recently used entries.
+
+import time
+from AI_Club_Tetris import TetrisBitboard as TBits
+from AI_Club_Tetris import TetrisPlacements as TPlace
+from AI_Club_Tetris import TetrisFitness as TFit
+from AI_Club_Tetris import TetrisBoardCache as TCache
+from AI_Club_Tetris.TetrisSettings import *
+
+
+# Where the next tile starts: spawned (like TetrisGame.spawn_tile), then dropped
+# once by the rest of the INSTA_FALL step that locked the previous tile
+def get_spawn_offsets(tile_shape):
+    return int(GRID_COL_COUNT / 2 - len(tile_shape[0]) / 2), 1
+
+
+# Tile that spawns once the placement locked: the next one, or the current one when it was swapped out
+def get_following_tile(placement, tile, next_tile):
+    return next_tile if placement[0] == 0 else tile
+
+
+class LookaheadSearch:
+    # depth: tiles placed per search (1 = greedy, like TetrisUtils.get_best_actions)
+    # time_budget (seconds) / node_budget (placements scored): per move, the deepest
+    # completed ply is used once one runs out, the first ply is always completed
+    def __init__(self, depth=SEARCH_DEPTH, beam_width=SEARCH_BEAM_WIDTH, time_budget=SEARCH_TIME_BUDGET,
+                 node_budget=SEARCH_NODE_BUDGET, cache_size=SEARCH_CACHE_SIZE):
+        self.depth = depth
+        self.beam_width = beam_width
+        self.time_budget = time_budget
+        self.node_budget = node_budget
+        self.cache_size = cache_size
+        self.cache = TCache.LRUCache(cache_size)
+        # Stats (totals)
+        self.moves = 0
+        self.nodes = 0
+        self.search_time = 0.0
+        # Stats (last move)
+        self.last_depth = 0
+        self.last_nodes = 0
+        self.last_time = 0.0
+        self.move_start = 0.0
+        self.move_nodes = 0
+
+    def out_of_budget(self):
+        if self.node_budget is not None and self.move_nodes >= self.node_budget:
+            return True
+        return self.time_budget is not None and time.perf_counter() - self.move_start >= self.time_budget
+
+    # >> Returns: [(fitness, rows after clearing lines, line score, placement), ...]
+    def score_placements(self, search):
+        if search is None or not search.placements:
+            return []
+        fitness = TFit.get_fitness_scores(TFit.boards_from_rows(
+            [locked_rows for locked_rows, _ in search.placements])).tolist()
+        self.move_nodes += len(fitness)
+        children = []
+        for (locked_rows, placement), value in zip(search.placements, fitness):
+            next_rows, _, lines = TBits.get_rows_and_lines_cleared(locked_rows)
+            children.append((value, next_rows, WEIGHT_LINE_CLEARED * lines, placement))
+        return children
+
+    # Placements of a tile at get_spawn_offsets (and of next_tile swapped in, if given)
+    # >> Returns: (search, children of score_placements), cached
+    def expand(self, rows, tile, next_tile=None):
+        key = (tuple(rows), tile, next_tile)
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry
+        tile_shape = TILE_SHAPES[tile]
+        search = TPlace.PlacementSearch(list(rows), tile_shape, get_spawn_offsets(tile_shape),
+                                        None if next_tile is None else TILE_SHAPES[next_tile])
+        entry = (search, self.score_placements(search))
+        self.cache.put(key, entry)
+        return entry
+
+    # Children of the first ply, the tile may already be moved / rotated
+    def expand_root(self, rows, tile, tile_shape, offsets, next_tile=None):
+        if offsets == get_spawn_offsets(tile_shape) and tile_shape == TILE_SHAPES[tile]:
+            return self.expand(rows, tile, next_tile)
+        search = TPlace.PlacementSearch(rows, tile_shape, offsets,
+                                        None if next_tile is None else TILE_SHAPES[next_tile])
+        return search, self.score_placements(search)
+
+    # tile: name of the current tile, tile_shape: its current rotation, tile_bank: names of the next tiles
+    # Action = index of { NOTHING, L, R, 2L, 2R, ROTATE, SWAP, FAST_FALL, INSTA_FALL }
+    def get_best_actions(self, board, tile, tile_shape, offsets, tile_bank):
+        self.move_start = time.perf_counter()
+        self.move_nodes = 0
+        rows = TBits.from_board(board)
+        queue = tuple(tile_bank)
+
+        # Beam entries: (value, rows, current tile, queue, line score so far, (search, placement) of the first ply)
+        next_tile = queue[0] if queue else None
+        search, children = self.expand_root(rows, tile, tile_shape, offsets, next_tile)
+        beam = [(value, next_rows, get_following_tile(placement, tile, next_tile), queue[1:], line_score,
+                 (search, placement)) for value, next_rows, line_score, placement in children]
+        if not beam:
+            self.finish_move(0)
+            return [ACTIONS.index("INSTA_FALL")]
+
+        depth = 1
+        while depth < self.depth:
+            next_beam = self.search_ply(sorted(beam, key=lambda node: node[0], reverse=True)[:self.beam_width])
+            # Out of budget (partial ply) or every branch tops out
+            if not next_beam:
+                break
+            beam = next_beam
+            depth += 1
+
+        best = max(beam, key=lambda node: node[0])
+        self.finish_move(depth)
+        search, placement = best[5]
+        return search.get_actions(placement)
+
+    # >> Returns: the next beam, None if the budget ran out
+    def search_ply(self, beam):
+        # Same board, tile and queue (reached through different orders) -> keep the best
+        next_beam = {}
+        for value, rows, tile, queue, line_score, root in beam:
+            if tile is None:
+                continue
+            if self.out_of_budget():
+                return None
+            next_tile = queue[0] if queue else None
+            _, children = self.expand(rows, tile, next_tile)
+            for child_value, next_rows, child_line_score, placement in children:
+                following = get_following_tile(placement, tile, next_tile)
+                key = (tuple(next_rows), following)
+                child_value += line_score
+                if key not in next_beam or next_beam[key][0] < child_value:
+                    next_beam[key] = (child_value, next_rows, following, queue[1:], line_score + child_line_score,
+                                      root)
+        return list(next_beam.values())
+
+    def finish_move(self, depth):
+        self.last_time = time.perf_counter() - self.move_start
+        self.last_nodes = self.move_nodes
+        self.last_depth = depth
+        self.moves += 1
+        self.nodes += self.move_nodes
+        self.search_time += self.last_time
+
+    # Shortcut for a running game
+    def get_game_actions(self, game):
+        # Makes sure the tile bank is not empty
+        game.get_next_tile()
+        return self.get_best_actions(game.board, game.tile, game.tile_shape, (game.tile_x, game.tile_y),
+                                     game.tile_bank)
+
+    def get_stats(self):
+        cache = self.cache.get_stats()
+        return {
+            "moves": self.moves,
+            "nodes": self.nodes,
+            "nodes_per_sec": self.nodes / self.search_time if self.search_time else 0.0,
+            "cache_hits": cache["hits"],
+            "cache_misses": cache["misses"],
+            "cache_hit_rate": cache["hit_rate"],
+            "cache_entries": cache["entries"],
+            "last_depth": self.last_depth,
+            "last_nodes": self.last_nodes,
+            "last_move_ms": self.last_time * 1000,
+        }
@@ -48,6 +48,7 @@ SCREEN_RATIO = 0.55
 SCREEN_WIDTH = int(360 / SCREEN_RATIO * SIZE_SCALE)
 SCREEN_HEIGHT = int(720 * SIZE_SCALE)
 MAX_FPS = 30
+USE_BITBOARD = False  # store the board as row bitmasks (faster collisions and line clears)
 
 ########################
 # Score Configurations #
@@ -63,6 +64,34 @@ WEIGHT_HOLES = -7.5
 WEIGHT_BUMPINESS = -0.1845
 WEIGHT_LINE_CLEARED = 8
 
+########################
+# Search Configuration #
+########################
+# See TetrisSearch.py (budgets are per move, None = unlimited)
+SEARCH_DEPTH = 2
+SEARCH_BEAM_WIDTH = 32
+SEARCH_TIME_BUDGET = None
+SEARCH_NODE_BUDGET = None
+SEARCH_CACHE_SIZE = 50_000
+# RunnerNeo1's expert: LookaheadSearch instead of the greedy TetrisUtils.get_best_actions
+# (opt-in, depth 2 makes about 30x fewer decisions/sec; capped at 10k tiles, it topped out on
+# none of 5 seeds, greedy on 2)
+SEARCH_EXPERT = False
+BOARD_CACHE_SIZE = 10_000  # entries of every LRU of TetrisBoardCache (opt-in, see TetrisGame)
+
+###########################
+# Inference Configuration #
+###########################
+# See InferenceServer.py
+INFERENCE_MAX_BATCH_SIZE = 64
+INFERENCE_MAX_LATENCY = 0.002  # seconds the oldest request waits for the batch to fill up
+
+#######################
+# Video Configuration #
+#######################
+# See TetrisVideo.py
+VIDEO_SCALE = 0.5  # size of the exported frames relative to the screen
+
 ######################
 # STEP Configuration #
 ######################
@@ -0,0 +1,140 @@
+# Spectator mode for the TetrisGame.py
+# Keep the coupling to a minimum
+#
+# Watch a (headless) game from another process: on step, the game publishes its
+# frame (TetrisGame.get_frame) at most fps times per second into a single slot
+# of shared memory, the spectator process draws the latest one with TetrisRender.
+# The slot is guarded by a sequence counter (odd while being written), the
+# game never waits for the spectator and the spectator retries torn reads.
+#
+#   game = TetrisGame(headless=True)
+#   game.set_spectator(Spectator())
+#   ... train ...
+#   game.spectator.close()
+
+import time
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from AI_Club_Tetris.TetrisGame import Frame
+from AI_Club_Tetris.TetrisSettings import *
+
+# Layout of the slot in shared memory: (name, dtype, shape)
+FRAME_LAYOUT = [
+    ("seq", np.int64, ()),
+    ("stopped", np.bool_, ()),
+    ("cells", np.int8, (GRID_ROW_COUNT, GRID_COL_COUNT)),
+    ("score", np.float64, ()),
+    ("lines", np.int64, ()),
+    ("high_score", np.float64, ()),
+    ("high_score_lines", np.int64, ()),
+    ("fitness", np.float64, ()),
+    ("next_tile", np.int8, ()),
+    ("active", np.bool_, ()),
+    ("paused", np.bool_, ()),
+]
+
+
+def get_frame_nbytes():
+    return sum(np.dtype(dtype).itemsize * int(np.prod(shape)) for _, dtype, shape in FRAME_LAYOUT)
+
+
+def get_frame_views(buffer):
+    views = {}
+    offset = 0
+    for name, dtype, shape in FRAME_LAYOUT:
+        views[name] = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+        offset += views[name].nbytes
+    return views
+
+
+def write_frame(views, frame):
+    views["seq"] += 1
+    views["cells"][:] = frame.cells
+    views["score"][()] = frame.score
+    views["lines"][()] = frame.lines
+    views["high_score"][()] = frame.high_score
+    views["high_score_lines"][()] = frame.high_score_lines
+    views["fitness"][()] = frame.fitness
+    views["next_tile"][()] = TILES.index(frame.next_tile)
+    views["active"][()] = frame.active
+    views["paused"][()] = frame.paused
+    views["seq"] += 1
+
+
+# >> Returns: (seq, frame) of a consistent copy of the slot, None if it was being written
+def read_frame(views):
+    seq = int(views["seq"])
+    if seq % 2 == 1:
+        return None
+    frame = Frame(views["cells"].tolist(), float(views["score"]), int(views["lines"]), float(views["high_score"]),
+                  int(views["high_score_lines"]), float(views["fitness"]), TILES[int(views["next_tile"])],
+                  bool(views["active"]), bool(views["paused"]))
+    if int(views["seq"]) != seq:
+        return None
+    return seq, frame
+
+
+def spectator_process(shm_name, fps):
+    import pygame
+    from AI_Club_Tetris import TetrisRender as TRender
+    shm = shared_memory.SharedMemory(name=shm_name)
+    views = get_frame_views(shm.buf)
+    pygame.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode(size=(SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption(MESSAGES.get("TITLE") + " (spectator)")
+    cache = TRender.RenderCache(int(SCREEN_HEIGHT / GRID_ROW_COUNT))
+    clock = pygame.time.Clock()
+    last_seq = 0
+    while not views["stopped"]:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                views["stopped"][()] = True
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                cache.invalidate()
+        result = read_frame(views)
+        if result is not None and (result[0] != last_seq or cache.frame is None):
+            last_seq, frame = result
+            cache.draw_frame(screen, frame)
+        clock.tick(fps)
+    pygame.quit()
+    del views
+    shm.close()
+
+
+class Spectator:
+    # fps: frames published per second (and drawn by the spectator process)
+    def __init__(self, fps=MAX_FPS):
+        self.interval = 1.0 / fps
+        self.last_publish = 0.0
+        self.frames = 0
+        self.shm = shared_memory.SharedMemory(create=True, size=get_frame_nbytes())
+        self.views = get_frame_views(self.shm.buf)
+        self.views["seq"][()] = 0
+        self.views["stopped"][()] = False
+        # Spawn, the trainer may hold CUDA or threads
+        context = mp.get_context("spawn")
+        self.process = context.Process(target=spectator_process, args=(self.shm.name, fps), daemon=True)
+        self.process.start()
+
+    # Called by TetrisGame.step, throttled to fps
+    def publish(self, game):
+        now = time.perf_counter()
+        if now - self.last_publish < self.interval or self.views["stopped"]:
+            return
+        self.last_publish = now
+        write_frame(self.views, game.get_frame())
+        self.frames += 1
+
+    # False once the window was closed
+    @property
+    def watching(self):
+        return not self.views["stopped"]
+
+    def close(self):
+        self.views["stopped"][()] = True
+        self.process.join()
+        self.views = None
+        self.shm.close()
+        self.shm.unlink()
@@ -3,6 +3,9 @@
 
 from copy import deepcopy
 from AI_Club_Tetris import TetrisGame as TGame
+from AI_Club_Tetris import TetrisBitboard as TBits
+from AI_Club_Tetris import TetrisPlacements as TPlace
+from AI_Club_Tetris import TetrisFitness as TFit
 from AI_Club_Tetris.TetrisSettings import *
 
 
@@ -49,51 +52,15 @@ def get_future_board_with_tile(board, tile, offsets, flattened=False):
 
 
 def get_best_actions(board, curr_tile, next_tile, offsets):
-    # Tiles:
-    # [curr_tile, next_tile]
-    # Rotations:
-    # [rotation 0, rotation 1, rotation 2, rotation 3]
-    # X Coords:
-    # [TileX 0, ..., TileX N]
-    best_fitness = -9999
-    best_tile_index = -1
-    best_rotation = -1
-    best_x = -1
-
-    tiles = [curr_tile, next_tile]
-    # 2 tiles: current and next
-    for tile_index in range(len(tiles)):
-        tile = tiles[tile_index]
-        # Rotation: 0-3 times (4x is the same as 0x)
-        for rotation_count in range(0, 4):
-            # X movement
-            for x in range(0, GRID_COL_COUNT - len(tile[0]) + 1):
-                # TODO: check if the X is actually reachable
-                new_board = get_future_board_with_tile(board, tile, (x, offsets[1]), True)
-                fitness = get_fitness_score(new_board)
-                if fitness > best_fitness:
-                    best_fitness = fitness
-                    best_tile_index = tile_index
-                    best_rotation = rotation_count
-                    best_x = x
-            # Rotate tile (prep for next iteration)
-            tile = get_rotated_tile(tile)
-
-    # Obtained best stats, now convert them into sequences of actions
+    # Candidates: every reachable placement of the current tile,
+    # and of the next tile swapped in (see TetrisPlacements)
     # Action = index of { NOTHING, L, R, 2L, 2R, ROTATE, SWAP, FAST_FALL, INSTA_FALL }
-    actions = []
-    if tiles[best_tile_index] != curr_tile:
-        actions.append(ACTIONS.index("SWAP"))
-    for _ in range(best_rotation):
-        actions.append(ACTIONS.index("ROTATE"))
-    temp_x = offsets[0]
-    while temp_x != best_x:
-        direction = 1 if temp_x < best_x else -1
-        magnitude = 1 if abs(temp_x - best_x) == 1 else 2
-        temp_x += direction * magnitude
-        actions.append(ACTIONS.index(("" if magnitude == 1 else "2") + ("R" if direction == 1 else "L")))
-    actions.append(ACTIONS.index("INSTA_FALL"))
-    return actions
+    search = TPlace.PlacementSearch(TBits.from_board(board), curr_tile, offsets, next_tile)
+    if not search.placements:
+        return [ACTIONS.index("INSTA_FALL")]
+    # Score every placement at once
+    fitness = TFit.get_fitness_scores(TFit.boards_from_rows([locked_rows for locked_rows, _ in search.placements]))
+    return search.get_actions(search.placements[int(fitness.argmax())][1])
 
 
 ################
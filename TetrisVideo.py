@@ -0,0 +1,204 @@
+# Offline video export for the TetrisGame.py
+# Keep the coupling to a minimum
+#
+# Renders the frames of a recorded episode (see TetrisEpisode) or of a list of
+# boards offscreen, with the same look as the game window (TetrisRender), split
+# over worker processes. No display and no real time are needed.
+#
+# Output: a directory of PNG images (frame_000000.png, ...) or an animated GIF
+# (needs Pillow). GIF frames are encoded by the workers, only the pixels that
+# changed since the previous frame, against a global palette of the COLORS.
+#
+# python TetrisVideo.py episodes.jsonl episode.gif [-e 0] [-w 4] [-s 0.5] [--fps 30]
+
+import os
+import sys
+import time
+import struct
+import argparse
+import numpy as np
+import multiprocessing as mp
+from AI_Club_Tetris import TetrisGame as TGame
+from AI_Club_Tetris import TetrisEpisode as TEpisode
+from AI_Club_Tetris import TetrisUtils as TUtils
+from AI_Club_Tetris.TetrisSettings import *
+
+try:
+    from PIL import Image, GifImagePlugin
+except ImportError:  # Image sequences only
+    Image = None
+
+# Global GIF palette: every color the renderer uses (no antialiasing anywhere)
+PALETTE = sorted(set(TUtils.get_color_tuple(color) for color in COLORS.values()))
+PALETTE_KEYS = np.array([(r << 16) | (g << 8) | b for r, g, b in PALETTE])
+# Chunks per worker, so that the workers finish at about the same time
+CHUNKS_PER_WORKER = 4
+
+
+##########
+# Frames #
+##########
+# Frames of an episode replayed on a headless game, one per state (reset and every step)
+def get_episode_frames(episode):
+    game = TGame.TetrisGame(headless=True, bitboard=episode.get("bitboard", USE_BITBOARD))
+    game.reset(episode["seed"])
+    frames = [game.get_frame()]
+    for action in TEpisode.decode_actions(episode["actions"]):
+        game.step(action)
+        frames.append(game.get_frame())
+    return frames
+
+
+# Frames showing boards only (e.g. recorded observations), next_tile: shown next to all of them
+def get_board_frames(boards, next_tile=TILES[0]):
+    return [TGame.Frame([list(row) for row in board], 0.0, 0, 0.0, 0, 0.0, next_tile, True, False)
+            for board in boards]
+
+
+##########
+# Worker #
+##########
+# Imported by the workers only
+pygame = None
+surface = None
+cache = None
+# (shift, mask, table): the palette index of a pixel value is table[(value >> shift) & mask]
+palette_lookup = None
+
+
+def init_worker():
+    global pygame, surface, cache, palette_lookup
+    import pygame
+    from AI_Club_Tetris import TetrisRender as TRender
+    # Offscreen surfaces only need the fonts (no display, SDL keeps its hands off the signals)
+    pygame.font.init()
+    surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    cache = TRender.RenderCache(int(SCREEN_HEIGHT / GRID_ROW_COUNT))
+    palette_lookup = get_palette_lookup([surface.map_rgb(color) for color in PALETTE])
+
+
+def get_frame_size(scale):
+    return int(SCREEN_WIDTH * scale), int(SCREEN_HEIGHT * scale)
+
+
+# Draws the frames one after the other (only what changed), yields the scaled surfaces
+def render_frames(frames, scale):
+    cache.invalidate()
+    size = get_frame_size(scale)
+    for frame in frames:
+        cache.draw_frame(surface, frame, update=False)
+        yield pygame.transform.scale(surface, size) if scale != 1 else surface
+
+
+# Smallest bit field of the pixel values that tells the palette colors apart
+def get_palette_lookup(values):
+    for bits in range(4, 17):
+        mask = (1 << bits) - 1
+        for shift in range(32 - bits + 1):
+            keys = [(value >> shift) & mask for value in values]
+            if len(set(keys)) == len(values):
+                table = np.zeros(mask + 1, dtype=np.uint8)
+                table[keys] = np.arange(len(values))
+                return shift, mask, table
+    raise ValueError("palette colors cannot be told apart")
+
+
+# values: (height, width) pixel values of a surface
+def get_palette_indexes(values):
+    shift, mask, table = palette_lookup
+    return table[(values >> shift) & mask]
+
+
+def render_png_chunk(args):
+    frames, start, path, scale = args
+    for i, image in enumerate(render_frames(frames, scale)):
+        pygame.image.save(image, os.path.join(path, f"frame_{start + i:06d}.png"))
+    return len(frames)
+
+
+# >> Returns: the GIF blocks of the frames (the first one is complete, the others only hold what changed)
+def render_gif_chunk(args):
+    frames, scale, duration = args
+    blocks = []
+    previous = None
+    for image in render_frames(frames, scale):
+        # A copy: a pixel view would keep the surface locked (the worker surface itself at scale 1)
+        values = pygame.surfarray.array2d(image).T
+        top, left, bottom, right = 0, 0, values.shape[0], values.shape[1]
+        if previous is not None:
+            changed = values != previous
+            rows = np.flatnonzero(changed.any(1))
+            if len(rows):
+                cols = np.flatnonzero(changed.any(0))
+                top, left, bottom, right = rows[0], cols[0], rows[-1] + 1, cols[-1] + 1
+            else:
+                top, left, bottom, right = 0, 0, 1, 1
+        indexes = get_palette_indexes(values[top:bottom, left:right])
+        blocks.append(b"".join(GifImagePlugin.getdata(Image.fromarray(indexes, "L"), (int(left), int(top)),
+                                                      duration=duration)))
+        previous = values
+    return b"".join(blocks)
+
+
+##########
+# Export #
+##########
+def get_gif_header(size):
+    palette = b"".join(bytes(color) for color in PALETTE).ljust(256 * 3, b"\0")
+    # Global color table of 256 colors, loop forever
+    return (b"GIF89a" + struct.pack("<HHBBB", size[0], size[1], 0xF7, 0, 0) + palette +
+            b"!\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")
+
+
+# path: a .gif file, anything else is a directory of PNG images
+# >> Returns: frames written
+def export_frames(frames, path, workers=None, scale=VIDEO_SCALE, fps=MAX_FPS):
+    gif = path.lower().endswith(".gif")
+    if gif and Image is None:
+        raise ImportError("GIF export needs Pillow (pip install pillow), export to a directory of PNG images instead")
+    if not gif:
+        os.makedirs(path, exist_ok=True)
+    workers = workers or os.cpu_count()
+    chunk_size = max(1, -(-len(frames) // (workers * CHUNKS_PER_WORKER)))
+    if gif:
+        duration = 1000 / fps
+        tasks = [(frames[i:i + chunk_size], scale, duration) for i in range(0, len(frames), chunk_size)]
+    else:
+        tasks = [(frames[i:i + chunk_size], i, path, scale) for i in range(0, len(frames), chunk_size)]
+    context = mp.get_context("spawn")
+    pool = context.Pool(workers, initializer=init_worker)
+    try:
+        if gif:
+            with open(path, "wb") as f:
+                f.write(get_gif_header(get_frame_size(scale)))
+                # In order, every chunk starts with a complete frame
+                for blocks in pool.imap(render_gif_chunk, tasks):
+                    f.write(blocks)
+                f.write(b";")
+        else:
+            for _ in pool.imap_unordered(render_png_chunk, tasks):
+                pass
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    pool.join()
+    return len(frames)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render a recorded episode to PNG images or a GIF")
+    parser.add_argument("episodes", help="episode log (see TetrisEpisode.py)")
+    parser.add_argument("output", help=".gif file or directory of PNG images")
+    parser.add_argument("-e", "--episode", type=int, default=0, help="index of the episode in the log")
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument("-s", "--scale", type=float, default=VIDEO_SCALE)
+    parser.add_argument("--fps", type=float, default=MAX_FPS)
+    args = parser.parse_args()
+
+    episode = TEpisode.load_episodes(args.episodes)[args.episode]
+    start = time.perf_counter()
+    frames = get_episode_frames(episode)
+    count = export_frames(frames, args.output, args.workers, args.scale, args.fps)
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {count} frames to {args.output} in {elapsed:.1f}s ({count / elapsed:.0f} frames/sec)", file=sys.stderr)
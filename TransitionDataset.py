@@ -0,0 +1,84 @@
+# PyTorch dataset over one or more TransitionStore files (shards)
+# Records stay on disk (memory-mapped), only the requested batches get decoded,
+# so the shards can be much larger than RAM.
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+from AI_Club_Tetris import TransitionStore as TStore
+
+
+class TransitionDataset(Dataset):
+    def __init__(self, paths):
+        self.readers = [TStore.TransitionReader(path) for path in paths]
+        # Global index of the first record of every shard
+        self.offsets = np.cumsum([0] + [len(reader) for reader in self.readers])
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    # Global index -> (shard, index in shard)
+    def locate(self, idx):
+        shard = np.searchsorted(self.offsets, idx, side="right") - 1
+        return shard, idx - self.offsets[shard]
+
+    # (state (200), action, reward, next_state (200)), what a DataLoader expects
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        shard, local = self.locate(idx)
+        states, actions, rewards, next_states = self.readers[shard].get(slice(local, local + 1))
+        return states[0], actions[0], rewards[0], next_states[0]
+
+    # Raw records (views of the memory map when they come from a single shard)
+    def get_records(self, start, end):
+        shard, local = self.locate(start)
+        if end - start <= len(self.readers[shard]) - local:
+            return self.readers[shard].records[local:local + end - start]
+        return np.concatenate([self.get_records(start, self.offsets[shard + 1]),
+                               self.get_records(self.offsets[shard + 1], end)])
+
+    # >> Returns: decoded (states, actions, rewards, next_states) for any global indices
+    def get_batch(self, indices):
+        indices = np.asarray(indices)
+        shards, local = self.locate(indices)
+        records = np.empty(len(indices), dtype=TStore.RECORD_DTYPE)
+        for shard in np.unique(shards):
+            mask = shards == shard
+            # Sorted reads are mostly sequential on the memory map
+            order = np.argsort(local[mask])
+            positions = np.flatnonzero(mask)[order]
+            records[positions] = self.readers[shard].records[local[mask][order]]
+        return TStore.decode_records(records)
+
+    # Shuffled minibatches across all shards
+    # Whole blocks of block_size records are read at a time (sequential IO), shuffle_blocks
+    # random blocks are mixed together before being cut into batches.
+    def iter_batches(self, batch_size, shuffle=True, block_size=4096, shuffle_blocks=16, seed=None,
+                     as_tensors=False):
+        rng = np.random.default_rng(seed)
+        starts = np.arange(0, len(self), block_size)
+        if shuffle:
+            rng.shuffle(starts)
+        pool = np.zeros(0, dtype=TStore.RECORD_DTYPE)
+        for group in range(0, len(starts), shuffle_blocks):
+            blocks = [self.get_records(start, min(start + block_size, len(self)))
+                      for start in starts[group:group + shuffle_blocks]]
+            pool = np.concatenate([pool] + blocks)
+            if shuffle:
+                pool = pool[rng.permutation(len(pool))]
+            full = len(pool) - len(pool) % batch_size
+            for start in range(0, full, batch_size):
+                yield self.make_batch(pool[start:start + batch_size], as_tensors)
+            pool = pool[full:]
+        if len(pool):
+            yield self.make_batch(pool, as_tensors)
+
+    @staticmethod
+    def make_batch(records, as_tensors):
+        batch = TStore.decode_records(records)
+        if as_tensors:
+            return tuple(torch.from_numpy(array) for array in batch)
+        return batch
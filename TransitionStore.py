@@ -0,0 +1,188 @@
+# Compact binary storage for (state, action, reward, next_state) transitions
+# Keep the coupling to a minimum
+#
+# File layout: HEADER_SIZE bytes of header, then fixed-size records back to back.
+# The writer only ever appends whole chunks of records, so the file can be
+# memory-mapped as a single record array at any time.
+#
+# An observation (flattened board with the current tile) is stored as two bit
+# planes: cells equal to 1 (board, or a LINE tile) and cells above 1 (the tile),
+# plus the value of the tile cells. 200 cells fit in 51 bytes instead of 200.
+
+import os
+import numpy as np
+from AI_Club_Tetris.TetrisSettings import *
+
+MAGIC = b"TETRISTR"
+VERSION = 1
+HEADER_SIZE = 64
+HEADER_DTYPE = np.dtype([("magic", "S8"), ("version", "<u4"), ("record_size", "<u4"), ("obs_size", "<u4")])
+
+OBS_SIZE = GRID_ROW_COUNT * GRID_COL_COUNT
+PLANE_SIZE = (OBS_SIZE + 7) // 8
+
+RECORD_DTYPE = np.dtype([
+    ("state_board", "u1", (PLANE_SIZE,)),
+    ("state_tile", "u1", (PLANE_SIZE,)),
+    ("state_value", "u1"),
+    ("action", "u1"),
+    ("reward", "<f4"),
+    ("next_board", "u1", (PLANE_SIZE,)),
+    ("next_tile", "u1", (PLANE_SIZE,)),
+    ("next_value", "u1"),
+])
+
+
+############
+# Encoding #
+############
+# obs: (N, 200) board values -> (board plane, tile plane, tile value)
+def pack_observations(obs):
+    obs = np.asarray(obs, dtype=np.uint8).reshape(-1, OBS_SIZE)
+    tile = obs > 1
+    values = np.where(tile.any(axis=1), obs.max(axis=1), 0).astype(np.uint8)
+    return np.packbits(obs == 1, axis=1), np.packbits(tile, axis=1), values
+
+
+def unpack_observations(board, tile, values):
+    obs = np.unpackbits(board, axis=1, count=OBS_SIZE)
+    tile = np.unpackbits(tile, axis=1, count=OBS_SIZE).astype(bool)
+    obs[tile] = np.broadcast_to(values[:, None], tile.shape)[tile]
+    return obs
+
+
+def encode_records(states, actions, rewards, next_states):
+    records = np.zeros(len(actions), dtype=RECORD_DTYPE)
+    records["state_board"], records["state_tile"], records["state_value"] = pack_observations(states)
+    records["action"] = actions
+    records["reward"] = rewards
+    records["next_board"], records["next_tile"], records["next_value"] = pack_observations(next_states)
+    return records
+
+
+# >> Returns: (states (N, 200), actions (N), rewards (N), next_states (N, 200))
+def decode_records(records):
+    states = unpack_observations(records["state_board"], records["state_tile"], records["state_value"])
+    next_states = unpack_observations(records["next_board"], records["next_tile"], records["next_value"])
+    return states, records["action"].astype(np.int64), records["reward"].astype(np.float32), next_states
+
+
+def make_header():
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header["magic"] = MAGIC
+    header["version"] = VERSION
+    header["record_size"] = RECORD_DTYPE.itemsize
+    header["obs_size"] = OBS_SIZE
+    return header.tobytes().ljust(HEADER_SIZE, b"\0")
+
+
+def check_header(data, path):
+    header = np.frombuffer(bytes(data[:HEADER_DTYPE.itemsize]), dtype=HEADER_DTYPE)[0]
+    if header["magic"] != MAGIC or header["version"] != VERSION:
+        raise ValueError(f"{path} is not a transition file")
+    if header["record_size"] != RECORD_DTYPE.itemsize or header["obs_size"] != OBS_SIZE:
+        raise ValueError(f"{path} was written with a different board size")
+
+
+##########
+# Writer #
+##########
+class TransitionWriter:
+    # Appends to an existing file, transitions are staged raw and encoded
+    # and flushed chunk_size at a time
+    def __init__(self, path, chunk_size=4096):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.states = np.zeros((chunk_size, OBS_SIZE), dtype=np.uint8)
+        self.actions = np.zeros(chunk_size, dtype=np.uint8)
+        self.rewards = np.zeros(chunk_size, dtype=np.float32)
+        self.next_states = np.zeros((chunk_size, OBS_SIZE), dtype=np.uint8)
+        self.chunk_count = 0
+        self.count = 0
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            with open(path, "rb") as f:
+                check_header(f.read(HEADER_SIZE), path)
+            self.count = (os.path.getsize(path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+            # Drop a partial record left by a crash, the appended records have to stay aligned
+            os.truncate(path, HEADER_SIZE + self.count * RECORD_DTYPE.itemsize)
+        self.file = open(path, "ab")
+        if not exists:
+            self.file.write(make_header())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, state, action, reward, next_state):
+        i = self.chunk_count
+        self.states[i] = np.ravel(state)
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = np.ravel(next_state)
+        self.chunk_count += 1
+        if self.chunk_count == self.chunk_size:
+            self.flush()
+
+    def write_batch(self, states, actions, rewards, next_states):
+        states = np.asarray(states, dtype=np.uint8).reshape(-1, OBS_SIZE)
+        next_states = np.asarray(next_states, dtype=np.uint8).reshape(-1, OBS_SIZE)
+        start = 0
+        while start < len(states):
+            taken = min(len(states) - start, self.chunk_size - self.chunk_count)
+            end = start + taken
+            i, j = self.chunk_count, self.chunk_count + taken
+            self.states[i:j] = states[start:end]
+            self.actions[i:j] = actions[start:end]
+            self.rewards[i:j] = rewards[start:end]
+            self.next_states[i:j] = next_states[start:end]
+            self.chunk_count = j
+            start = end
+            if self.chunk_count == self.chunk_size:
+                self.flush()
+
+    def flush(self):
+        if self.chunk_count == 0:
+            return
+        n = self.chunk_count
+        records = encode_records(self.states[:n], self.actions[:n], self.rewards[:n], self.next_states[:n])
+        self.file.write(records.tobytes())
+        self.file.flush()
+        self.count += n
+        self.chunk_count = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+##########
+# Reader #
+##########
+class TransitionReader:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            check_header(f.read(HEADER_SIZE), path)
+        count = (os.path.getsize(path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+        self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,)) \
+            if count else np.zeros(0, dtype=RECORD_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, idx):
+        return decode_records(self.records[idx])
+
+    # Yields decoded (states, actions, rewards, next_states) batches
+    def iter_batches(self, batch_size, shuffle=False, seed=None):
+        if shuffle:
+            order = np.random.default_rng(seed).permutation(len(self.records))
+            for start in range(0, len(order), batch_size):
+                # Sorted indices keep the reads on the memory map mostly sequential
+                yield self.get(np.sort(order[start:start + batch_size]))
+        else:
+            for start in range(0, len(self.records), batch_size):
+                yield self.get(slice(start, start + batch_size))